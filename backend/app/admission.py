@@ -0,0 +1,123 @@
+import math
+import os
+import time
+from fastapi import HTTPException
+from app import job_queue
+
+# New jobs are refused with 429 once the estimated queue wait exceeds ADMISSION_MAX_WAIT_S,
+# or the backlog exceeds ADMISSION_MAX_DEPTH (0 disables either check).
+ADMISSION_MAX_WAIT_S = int(os.getenv("ADMISSION_MAX_WAIT_S", "900"))
+ADMISSION_MAX_DEPTH = int(os.getenv("ADMISSION_MAX_DEPTH", "5000"))
+# Worker throughput is averaged over this many seconds of completions
+THROUGHPUT_WINDOW_S = int(os.getenv("THROUGHPUT_WINDOW_S", "300"))
+# Per-user token bucket: sustained jobs per minute (0 disables) and burst size. A batch
+# takes one token per job, so the burst is also the largest batch a user can submit;
+# the default admits a 200-page drawing set, or the 100 jobs tests/load_test_enqueue.py submits.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "120"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "200"))
+
+RATE_LIMIT_PREFIX = "rate_limit:jobs"
+
+# KEYS: bucket. ARGV: now, tokens per second, capacity, tokens to take (negative to give
+# tokens back, never beyond capacity).
+# Returns {1, 0} when the tokens were taken, else {0, milliseconds until they are available}.
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local wait_ms = 0
+if tokens >= cost then
+    tokens = math.min(capacity, tokens - cost)
+    allowed = 1
+else
+    wait_ms = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, wait_ms}
+"""
+
+_token_bucket_script = None
+
+
+async def take_tokens(redis, user_id, cost):
+    global _token_bucket_script
+    if _token_bucket_script is None:
+        _token_bucket_script = redis.register_script(TOKEN_BUCKET_LUA)
+    return await _token_bucket_script(
+        keys=[f"{RATE_LIMIT_PREFIX}:{user_id}"],
+        args=[time.time(), RATE_LIMIT_PER_MINUTE / 60, max(1, RATE_LIMIT_BURST), cost],
+    )
+
+
+async def check_rate_limit(redis, user_id, jobs=1):
+    """Take one token per job. Call it after admit(), and refund_rate_limit() if the jobs
+    then fail to be created, so a refused or failed submission costs nothing."""
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return
+    if jobs > max(1, RATE_LIMIT_BURST):
+        # Could never be admitted, however long the client waits
+        raise HTTPException(400, f"At most {max(1, RATE_LIMIT_BURST)} jobs can be submitted at once")
+    allowed, wait_ms = await take_tokens(redis, user_id, jobs)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many jobs submitted, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(wait_ms / 1000)))},
+        )
+
+
+async def refund_rate_limit(redis, user_id, jobs=1):
+    """Give back the tokens of jobs that were charged but not created."""
+    if RATE_LIMIT_PER_MINUTE <= 0:
+        return
+    try:
+        await take_tokens(redis, user_id, -jobs)
+    except Exception:
+        # Refunds are best effort; the bucket refills on its own
+        pass
+
+
+async def throughput(redis):
+    """Jobs finished per second across all workers over the last THROUGHPUT_WINDOW_S."""
+    now = int(time.time())
+    buckets = range(
+        (now - THROUGHPUT_WINDOW_S) // job_queue.COMPLETED_BUCKET_S + 1,
+        now // job_queue.COMPLETED_BUCKET_S + 1,
+    )
+    counts = await redis.mget([f"{job_queue.COMPLETED_PREFIX}:{b}" for b in buckets])
+    return sum(int(c) for c in counts if c) / THROUGHPUT_WINDOW_S
+
+
+async def estimate(redis, jobs=1):
+    """Current backlog, throughput, and the estimated seconds until the last of `jobs` new jobs
+    would be done waiting (None if unknown)."""
+    depth = sum(max(0, int(v)) for v in (await redis.hgetall(job_queue.DEPTH_KEY)).values())
+    rate = await throughput(redis)
+    wait = (depth + jobs) / rate if rate > 0 else None
+    return depth, rate, wait
+
+
+async def admit(redis, jobs=1):
+    """Refuse new work once the backlog is over capacity; returns the estimated wait in seconds."""
+    depth, rate, wait = await estimate(redis, jobs)
+
+    if ADMISSION_MAX_DEPTH and depth + jobs > ADMISSION_MAX_DEPTH:
+        retry_after = (depth + jobs - ADMISSION_MAX_DEPTH) / rate if rate > 0 else 60
+    elif ADMISSION_MAX_WAIT_S and wait is not None and wait > ADMISSION_MAX_WAIT_S:
+        # Time until enough of the backlog has drained to get back under the limit
+        retry_after = wait - ADMISSION_MAX_WAIT_S
+    else:
+        return wait
+
+    raise HTTPException(
+        status_code=429,
+        detail="The service is at capacity, please retry later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
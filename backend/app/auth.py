@@ -1,16 +1,93 @@
-from fastapi import Depends, HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header, Query
 from jose import JWTError, jwt
-from app.database import SessionLocal
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, AsyncSessionLocal
 from app.models import User
+from collections import OrderedDict, namedtuple
 from typing import Optional
 import os
+import threading
+import time
 import uuid
 
 MOCK_USER_ID = "00000000-0000-0000-0000-000000000000"
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 
-def get_current_user(authorization: Optional[str] = Header(None)):
+# Verified token -> user identity, so authenticated polling skips the users table
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "email"])
+
+
+class TokenCache:
+    """Thread-safe in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, user, token_expires_at=None):
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self.lock:
+            self.entries[token] = (user, expires_at)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for token in [t for t, (user, _) in self.entries.items() if user.id == user_id]:
+                del self.entries[token]
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+token_cache = TokenCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_delete")
+def invalidate_deleted_user(mapper, connection, target):
+    # Only fires for ORM deletes; bulk query().delete() callers must call invalidate_user themselves
+    invalidate_user(target.id)
+
+
+def invalidate_user(user_id):
+    token_cache.invalidate_user(user_id)
+
+
+async def get_current_user(authorization: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,12 +97,31 @@ def get_current_user(authorization: Optional[str] = Header(None)):
     try:
         # Extract token from "Bearer <token>"
         scheme, token = authorization.split()
-        if scheme.lower() != "bearer":
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication scheme"
-            )
-        
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    if scheme.lower() != "bearer":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication scheme"
+        )
+
+    return await authenticate_token(token, db)
+
+
+async def get_stream_user(token: str = Query(...)):
+    """Auth for EventSource clients, which cannot send an Authorization header.
+
+    Uses its own short-lived session so a long-running stream doesn't pin a pooled connection.
+    """
+    async with AsyncSessionLocal() as db:
+        return await authenticate_token(token, db)
+
+
+async def authenticate_token(token, db):
+    try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
@@ -33,21 +129,27 @@ def get_current_user(authorization: Optional[str] = Header(None)):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
+        user_uuid = uuid.UUID(user_id)
     except (JWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
     
+    # Signature and expiry are verified above; the user row only needs loading once per token
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
     # Get user from database
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == uuid.UUID(user_id)).first()
-    db.close()
+    db_user = (await db.execute(select(User).where(User.id == user_uuid))).scalar_one_or_none()
     
-    if user is None:
+    if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
     
+    user = AuthenticatedUser(id=db_user.id, email=db_user.email)
+    token_cache.set(token, user, payload.get("exp"))
     return user
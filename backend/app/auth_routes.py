@@ -1,18 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from app.database import SessionLocal
+from app.database import get_db
 from app.models import User
+from app.passwords import hash_password, verify_password
 import os
 
 router = APIRouter()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -32,20 +30,6 @@ class TokenResponse(BaseModel):
     token_type: str
     user: dict
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -54,21 +38,23 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 @router.post("/signup", response_model=TokenResponse)
-def signup(request: SignupRequest, db: Session = Depends(get_db)):
+async def signup(request: SignupRequest, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    existing_user = (await db.execute(select(User).where(User.email == request.email))).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
+
+    # Return the pooled connection while the hash waits for a bcrypt process
+    await db.close()
+
     # Create new user
-    hashed_password = get_password_hash(request.password)
+    hashed_password = await hash_password(request.password)
     new_user = User(
         email=request.email,
         password_hash=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     # Create access token
     access_token = create_access_token(data={"sub": str(new_user.id)})
@@ -83,15 +69,25 @@ def signup(request: SignupRequest, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     # Find user
-    user = db.query(User).filter(User.email == request.email).first()
+    user = (await db.execute(select(User).where(User.email == request.email))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    
+
+    # Return the pooled connection while the hash waits for a bcrypt process; the
+    # loaded user stays readable after close
+    await db.close()
+
     # Verify password
-    if not verify_password(request.password, user.password_hash):
+    matches, new_hash = await verify_password(request.password, user.password_hash)
+    if not matches:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    # Stored with an old BCRYPT_ROUNDS setting; upgrade it now that we have the plaintext
+    if new_hash:
+        await db.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
+        await db.commit()
     
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id)})
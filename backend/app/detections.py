@@ -0,0 +1,145 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import select, insert, func, distinct, literal, or_
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+import base64
+import uuid
+from app.auth import get_current_user
+from app.models import Detection, Job
+from app.database import get_db
+
+router = APIRouter()
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_SUMMARY_JOBS = 10000
+
+class DetectionItem(BaseModel):
+    label: str
+    confidence: float
+    box: List[float]
+    # Set for the detections of a PDF document: the 1-based page they were found on
+    page: Optional[int] = None
+
+class DetectionPage(BaseModel):
+    items: List[DetectionItem]
+    next_cursor: Optional[str]
+
+class LabelCount(BaseModel):
+    label: str
+    count: int
+    jobs: int
+
+class DetectionSummary(BaseModel):
+    jobs: int
+    detections: int
+    labels: List[LabelCount]
+
+def encode_cursor(detection_id):
+    return base64.urlsafe_b64encode(str(detection_id).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+def copy_detections(source_id, job_id, user_id):
+    """INSERT ... SELECT of one job's detections onto another job (result cache hits)."""
+    return insert(Detection).from_select(
+        ["job_id", "user_id", "label", "confidence", "x1", "y1", "x2", "y2"],
+        select(
+            literal(job_id, UUID(as_uuid=True)), literal(user_id, UUID(as_uuid=True)),
+            Detection.label, Detection.confidence, Detection.x1, Detection.y1, Detection.x2, Detection.y2
+        ).where(Detection.job_id == source_id).order_by(Detection.id)
+    )
+
+@router.get("/jobs/{job_id}/detections", response_model=DetectionPage)
+async def get_job_detections(
+    job_id: uuid.UUID,
+    label: Optional[str] = None,
+    min_confidence: float = Query(0, ge=0, le=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    page: Optional[int] = Query(None, ge=1),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """One job's detections in detection order, filtered by label/confidence; pass next_cursor for the following page.
+
+    For a PDF document these are the detections of all its pages (or only of page).
+    """
+    job = (await db.execute(select(Job.status).where(Job.id == job_id, Job.user_id == user.id))).scalar_one_or_none()
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    if job != "succeeded":
+        raise HTTPException(400, "Job not completed yet")
+
+    # Detections are stored against the job that produced them: the job itself, or its pages
+    query = select(
+        Detection.id, Detection.label, Detection.confidence, Detection.x1, Detection.y1, Detection.x2, Detection.y2, Job.page
+    ).join(Job, Job.id == Detection.job_id).where(or_(Job.id == job_id, Job.parent_id == job_id))
+    if page:
+        query = query.where(Job.page == page)
+    if label:
+        query = query.where(Detection.label == label)
+    if min_confidence:
+        query = query.where(Detection.confidence >= min_confidence)
+    if cursor:
+        query = query.where(Detection.id > decode_cursor(cursor))
+
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.execute(query.order_by(Detection.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return DetectionPage(
+        items=[DetectionItem(label=row.label, confidence=row.confidence, box=[row.x1, row.y1, row.x2, row.y2], page=row.page) for row in rows],
+        next_cursor=encode_cursor(rows[-1].id) if has_more else None
+    )
+
+@router.get("/detections/summary", response_model=DetectionSummary)
+async def get_detection_summary(
+    label: Optional[str] = None,
+    min_confidence: float = Query(0, ge=0, le=1),
+    last_jobs: Optional[int] = Query(None, ge=1, le=MAX_SUMMARY_JOBS),
+    since: Optional[datetime] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Detection counts by label across the user's jobs, optionally limited to the newest
+    last_jobs jobs and/or jobs created since a timestamp. A PDF document counts as one
+    job when selecting, and its pages' detections are included."""
+    query = select(
+        Detection.label,
+        func.count().label("count"),
+        func.count(distinct(Detection.job_id)).label("jobs")
+    ).where(Detection.user_id == user.id)
+    if label:
+        query = query.where(Detection.label == label)
+    if min_confidence:
+        query = query.where(Detection.confidence >= min_confidence)
+    if last_jobs or since:
+        jobs = select(Job.id).where(Job.user_id == user.id, Job.status == "succeeded", Job.parent_id.is_(None))
+        if since:
+            jobs = jobs.where(Job.created_at >= since)
+        if last_jobs:
+            jobs = jobs.order_by(Job.created_at.desc(), Job.id.desc()).limit(last_jobs)
+        selected = select(jobs.subquery().c.id)
+        pages = select(Job.id).where(Job.parent_id.in_(selected))
+        query = query.where(or_(Detection.job_id.in_(selected), Detection.job_id.in_(pages)))
+
+    rows = (await db.execute(query.group_by(Detection.label).order_by(func.count().desc(), Detection.label))).all()
+
+    # Distinct jobs overall can't be summed from the per-label counts
+    totals = query.with_only_columns(func.count(), func.count(distinct(Detection.job_id)))
+    detections, jobs = (await db.execute(totals)).one()
+
+    return DetectionSummary(
+        jobs=jobs,
+        detections=detections,
+        labels=[LabelCount(label=row.label, count=row.count, jobs=row.jobs) for row in rows]
+    )
@@ -0,0 +1,117 @@
+import asyncio
+import json
+from app.logger import setup_logger
+
+logger = setup_logger("backend-events", "backend")
+
+# Job status transitions are published per user on Redis pub/sub; the worker
+# publishes to the same channel names.
+CHANNEL_PREFIX = "job_events"
+KEEPALIVE_SECONDS = 15
+# Events buffered per open stream before it is closed as too slow
+STREAM_QUEUE_SIZE = 100
+
+
+def channel(user_id):
+    return f"{CHANNEL_PREFIX}:{user_id}"
+
+
+async def publish(redis, user_id, job_id, status, result=None):
+    event = {"job_id": str(job_id), "status": status}
+    if result is not None:
+        event["result"] = result
+    await redis.publish(channel(user_id), json.dumps(event))
+
+
+async def publish_many(redis, user_id, job_ids, status):
+    """One event per job, sent in a single pipelined round trip."""
+    async with redis.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.publish(channel(user_id), json.dumps({"job_id": str(job_id), "status": status}))
+        await pipe.execute()
+
+
+class Subscriber:
+    """One Redis pub/sub connection per API process, fanned out to every open stream.
+
+    Each stream gets its own asyncio.Queue; channels are subscribed while at least one
+    stream of their user is open, so Redis connections don't grow with open tabs.
+    """
+
+    def __init__(self, redis):
+        self.pubsub = redis.pubsub()
+        # channel -> queues of the streams listening on it
+        self.listeners = {}
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    async def listen(self, name):
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        async with self.lock:
+            if name not in self.listeners:
+                self.listeners[name] = set()
+                await self.pubsub.subscribe(name)
+            self.listeners[name].add(queue)
+            if self.task is None or self.task.done():
+                self.task = asyncio.create_task(self.run())
+        return queue
+
+    async def unlisten(self, name, queue):
+        async with self.lock:
+            queues = self.listeners.get(name)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self.listeners[name]
+                await self.pubsub.unsubscribe(name)
+
+    async def run(self):
+        while self.listeners:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                logger.warning(f"Job event subscription failed, retrying: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+            for queue in list(self.listeners.get(message["channel"].decode("utf-8"), ())):
+                try:
+                    queue.put_nowait(message["data"])
+                except asyncio.QueueFull:
+                    # A stream that fell this far behind is closed instead; its client
+                    # reconnects and resyncs
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+
+_subscriber = None
+
+
+def subscriber(redis):
+    global _subscriber
+    if _subscriber is None:
+        _subscriber = Subscriber(redis)
+    return _subscriber
+
+
+async def stream(request, redis, user_id):
+    """Server-sent events for one user's job status transitions."""
+    events = subscriber(redis)
+    queue = await events.listen(channel(user_id))
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                data = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if data is None:
+                return
+            yield f"event: status\ndata: {data.decode('utf-8')}\n\n"
+    finally:
+        await events.unlisten(channel(user_id), queue)
@@ -1,7 +1,11 @@
 from fastapi import APIRouter
 import psycopg2
 import redis
+from redis import asyncio as aioredis
 import os
+from app import admission, job_queue, passwords, result_cache
+from app.database import pool_stats
+from app.auth import token_cache
 
 router = APIRouter()
 
@@ -14,3 +18,22 @@ def ready():
     psycopg2.connect(os.getenv("DATABASE_URL")).close()
     redis.Redis.from_url(os.getenv("REDIS_URL")).ping()
     return {"status": "ready"}
+
+@router.get("/metrics")
+async def metrics():
+    r = aioredis.from_url(os.getenv("REDIS_URL"))
+    try:
+        cache_stats = await result_cache.stats(r)
+        queue_stats = await job_queue.stats(r)
+        depth, rate, wait = await admission.estimate(r)
+        queue_stats["throughput_per_s"] = rate
+        queue_stats["estimated_wait_s"] = wait
+    finally:
+        await r.aclose()
+    return {
+        "db_pool": pool_stats(),
+        "auth_cache": token_cache.stats(),
+        "result_cache": cache_stats,
+        "job_queue": queue_stats,
+        "password_hashing": passwords.stats(),
+    }
@@ -0,0 +1,102 @@
+import os
+
+# Jobs are queued per user and per priority class: job_queue:{class}:user:{user_id}.
+# job_queue:{class}:ring lists the users of a class that have queued jobs; workers
+# take one job per user in turn, so a user with a deep backlog cannot starve others.
+# The worker keeps its own copy of these key names (worker/job_queue.py).
+KEY_PREFIX = "job_queue"
+DEPTH_KEY = f"{KEY_PREFIX}:depth"
+SIGNAL_KEY = f"{KEY_PREFIX}:signal"
+LEASES_KEY = f"{KEY_PREFIX}:leases"
+DEAD_LETTER_KEY = f"{KEY_PREFIX}:dead"
+# Worker processes register here and heartbeat once warmed up
+CONSUMERS_KEY = f"{KEY_PREFIX}:consumers"
+HEARTBEAT_PREFIX = f"{KEY_PREFIX}:heartbeat"
+WAIT_PREFIX = f"{KEY_PREFIX}:wait_ms"
+# Workers count finished jobs in COMPLETED_BUCKET_S-second buckets: job_queue:completed:{bucket}
+COMPLETED_PREFIX = f"{KEY_PREFIX}:completed"
+COMPLETED_BUCKET_S = 10
+
+# Classes and their order come from the same PRIORITY_WEIGHTS the workers schedule by
+# (worker/job_queue.py), so the API never accepts a class no worker takes. Highest
+# priority first.
+PRIORITY_CLASSES = [item.strip().partition(":")[0] for item in os.getenv("PRIORITY_WEIGHTS", "high:4,normal:2,low:1").split(",")]
+DEFAULT_PRIORITY = os.getenv("DEFAULT_PRIORITY", "normal")
+if DEFAULT_PRIORITY not in PRIORITY_CLASSES:
+    raise ValueError(f"DEFAULT_PRIORITY {DEFAULT_PRIORITY} is not one of PRIORITY_WEIGHTS ({', '.join(PRIORITY_CLASSES)})")
+
+# KEYS: user queue, class ring, depth hash, signal list. ARGV: message, user id, class.
+ENQUEUE_LUA = """
+if redis.call('LPUSH', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+redis.call('HINCRBY', KEYS[3], ARGV[3], 1)
+-- Wake one idle worker; the list is only a doorbell, so keep it short
+redis.call('LPUSH', KEYS[4], 1)
+redis.call('LTRIM', KEYS[4], 0, 999)
+"""
+
+_enqueue_script = None
+
+
+def user_queue(priority, user_id):
+    return f"{KEY_PREFIX}:{priority}:user:{user_id}"
+
+
+def ring(priority):
+    return f"{KEY_PREFIX}:{priority}:ring"
+
+
+async def enqueue(redis, user_id, priority, message):
+    global _enqueue_script
+    if _enqueue_script is None:
+        _enqueue_script = redis.register_script(ENQUEUE_LUA)
+    await _enqueue_script(
+        keys=[user_queue(priority, user_id), ring(priority), DEPTH_KEY, SIGNAL_KEY],
+        args=[message, str(user_id), priority],
+    )
+
+
+async def enqueue_many(redis, jobs):
+    """Enqueue (user_id, priority, message) tuples with one pipelined round trip."""
+    global _enqueue_script
+    if _enqueue_script is None:
+        _enqueue_script = redis.register_script(ENQUEUE_LUA)
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id, priority, message in jobs:
+            await _enqueue_script(
+                keys=[user_queue(priority, user_id), ring(priority), DEPTH_KEY, SIGNAL_KEY],
+                args=[message, str(user_id), priority],
+                client=pipe,
+            )
+        await pipe.execute()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def stats(redis):
+    depth = await redis.hgetall(DEPTH_KEY)
+    classes = {}
+    for priority in PRIORITY_CLASSES:
+        # Recent queue waits recorded by the workers when they take a job
+        waits = [float(w) for w in await redis.lrange(f"{WAIT_PREFIX}:{priority}", 0, -1)]
+        classes[priority] = {
+            "depth": max(0, int(depth.get(priority.encode(), 0))),
+            "users": await redis.llen(ring(priority)),
+            "wait_ms_p50": percentile(waits, 50),
+            "wait_ms_p95": percentile(waits, 95),
+        }
+    consumers = await redis.smembers(CONSUMERS_KEY)
+    ready = await redis.exists(*[f"{HEARTBEAT_PREFIX}:{c.decode()}" for c in consumers]) if consumers else 0
+    return {
+        "ready_workers": ready,
+        "pending": sum(c["depth"] for c in classes.values()),
+        "leased": await redis.zcard(LEASES_KEY),
+        "dead_letter": await redis.llen(DEAD_LETTER_KEY),
+        "classes": classes,
+    }
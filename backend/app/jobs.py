@@ -1,18 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response, Request, Query
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import select, update, delete, tuple_, func
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import base64
 import io
-import uuid, os, json
-from redis import Redis
-from app.auth import get_current_user
+import uuid, os, json, time
+import asyncio
+import zipfile
+import pypdfium2 as pdfium
+from redis import asyncio as aioredis
+from app.auth import get_current_user, get_stream_user
 from app.models import Job
-from app.database import SessionLocal
+from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import result_cache, events, job_queue, admission, detections
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.datatypes import PostPolicy
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from email.utils import format_datetime
 
 from app.logger import setup_logger
 
 router = APIRouter()
 logger = setup_logger("backend-jobs", "backend")
-redis = Redis.from_url(os.getenv("REDIS_URL"))
+redis = aioredis.from_url(os.getenv("REDIS_URL"))
 
 minio_client = Minio(
     os.getenv("MINIO_ENDPOINT"),
@@ -21,130 +37,778 @@ minio_client = Minio(
     secure=False
 )
 
+# MinIO calls are blocking; routes run them on the threadpool via run_in_threadpool,
+# and downloads are streamed from a sync iterator that Starlette drives off the event loop.
+
+# Presigned URLs are handed to browsers, so they must be signed for the host the
+# browser sees. A fixed region keeps presigning offline (no bucket-location lookup).
+MINIO_PUBLIC_ENDPOINT = os.getenv("MINIO_PUBLIC_ENDPOINT") or os.getenv("MINIO_ENDPOINT")
+MINIO_PUBLIC_SECURE = os.getenv("MINIO_PUBLIC_SECURE", "false").lower() == "true"
+presign_client = Minio(
+    MINIO_PUBLIC_ENDPOINT,
+    access_key=os.getenv("MINIO_ACCESS_KEY"),
+    secret_key=os.getenv("MINIO_SECRET_KEY"),
+    secure=MINIO_PUBLIC_SECURE,
+    region=os.getenv("MINIO_REGION", "us-east-1")
+)
+PRESIGNED_URL_EXPIRY = timedelta(seconds=int(os.getenv("PRESIGNED_URL_EXPIRY_SECONDS", "900")))
+
+# Largest accepted input; direct uploads are bounded by their presigned POST policy
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Direct uploads not committed within this long are deleted, with anything stored for them
+UPLOAD_COMMIT_TIMEOUT = timedelta(seconds=int(os.getenv("UPLOAD_COMMIT_TIMEOUT_SECONDS", "3600")))
+
+ALLOWED_CONTENT_TYPES = ["image/png", "image/jpeg"]
+# Multi-page documents are stored as uploaded; the worker rasterizes and fans out their pages.
+# Each page is a job for the rate limit and admission, so pages are counted on submission.
+DOCUMENT_CONTENT_TYPES = ["application/pdf"]
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+ZIP_CONTENT_TYPES = ["application/zip", "application/x-zip-compressed"]
+IMAGE_EXTENSIONS = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+# Batch submission: at most BATCH_MAX_FILES images per request (zip members included),
+# stored BATCH_UPLOAD_CONCURRENCY at a time
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_UPLOAD_CONCURRENCY = max(1, int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "8")))
+FINAL_STATUSES = ["succeeded", "failed"]
+
+# Object names of a job's outputs. The worker records them in the result since the
+# overlay format is configurable; results from before that used these names.
+ARTIFACTS = {"overlay": "overlay.png", "csv": "results.csv"}
+# Overlay sizes served by /jobs/{id}/overlay/sizes/{size}; "full" is the overlay itself
+OVERLAY_SIZES = ["thumbnail", "medium", "full"]
+ARTIFACT_MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp", ".jpg": "image/jpeg", ".csv": "text/csv"}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+class JobSummary(BaseModel):
+    id: uuid.UUID
+    status: str
+    model_name: Optional[str] = None
+    model_version: Optional[str] = None
+    created_at: datetime
+    result: Optional[str] = None
+
+class JobPage(BaseModel):
+    items: List[JobSummary]
+    next_cursor: Optional[str]
+
+class UploadRequest(BaseModel):
+    content_type: str
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STORED_READ_SIZE = 256 * 1024
+# Artifacts never change once a job has succeeded. They are per-user, so only the browser may cache them.
+ARTIFACT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def parse_range(range_header, size):
+    """Parse a single "bytes=start-end" range into (offset, length); None if the header should be ignored."""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start == "":
+            # Suffix range: the last N bytes
+            offset = size - min(int(end), size)
+            last = size - 1
+        else:
+            offset = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if offset >= size or last < offset:
+        raise HTTPException(416, "Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return offset, last - offset + 1
+
+async def stream_object(request, bucket, path, media_type, not_found, headers=None):
+    """Stream a MinIO object to the client in chunks, honouring If-None-Match and Range."""
+    try:
+        stat = await run_in_threadpool(minio_client.stat_object, bucket, path)
+    except S3Error as e:
+        logger.error(f"Error fetching {path}: {e}")
+        raise HTTPException(404, not_found)
+
+    etag = f'"{stat.etag}"'
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(stat.last_modified, usegmt=True),
+        "Cache-Control": ARTIFACT_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        **(headers or {})
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=response_headers)
+
+    status_code = 200
+    offset, length = 0, stat.size
+    byte_range = parse_range(request.headers.get("range"), stat.size)
+    # If-Range: only honour the range if the client's copy is still current
+    if byte_range and request.headers.get("if-range", etag) == etag:
+        offset, length = byte_range
+        status_code = 206
+        response_headers["Content-Range"] = f"bytes {offset}-{offset + length - 1}/{stat.size}"
+    response_headers["Content-Length"] = str(length)
+
+    if length == 0:
+        return Response(status_code=status_code, media_type=media_type, headers=response_headers)
+
+    try:
+        response = await run_in_threadpool(minio_client.get_object, bucket, path, offset=offset, length=length)
+    except S3Error as e:
+        logger.error(f"Error fetching {path}: {e}")
+        raise HTTPException(404, not_found)
+
+    # Starlette iterates sync generators on the threadpool, so reads never block the event loop
+    def iterate():
+        try:
+            yield from response.stream(STREAM_CHUNK_SIZE)
+        finally:
+            response.close()
+            response.release_conn()
+
+    return StreamingResponse(iterate(), status_code=status_code, media_type=media_type, headers=response_headers)
+
+class StoredObject(io.RawIOBase):
+    """Seekable read-only view of a stored object that downloads only the byte ranges read.
+
+    Wrapped in a BufferedReader, it lets pdfium count a PDF's pages from its trailer and
+    page tree without the document passing through the API.
+    """
+
+    def __init__(self, bucket, path, size):
+        self.bucket = bucket
+        self.path = path
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        response = minio_client.get_object(self.bucket, self.path, offset=self.position, length=length)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        memoryview(buffer).cast("B")[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+def encode_cursor(created_at, job_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{job_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(job_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+async def get_user_job(db, job_id, user):
+    job = (await db.execute(select(Job).where(Job.id == job_id, Job.user_id == user.id))).scalar_one_or_none()
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+def artifact_names(result):
+    try:
+        recorded = json.loads(result or "{}").get("artifacts") or {}
+    except ValueError:
+        recorded = {}
+    return {**ARTIFACTS, **recorded}
+
+def artifact_media_type(name):
+    return ARTIFACT_MEDIA_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+
+async def reuse_cached_result(db, job, user, bucket, entry):
+    """Copy the artifacts of an earlier job with identical input and mark this job succeeded."""
+    source = await db.get(Job, uuid.UUID(entry["job_id"]))
+    if source is None or source.status != "succeeded":
+        return False
+
+    for name in artifact_names(source.result).values():
+        await run_in_threadpool(
+            minio_client.copy_object,
+            bucket,
+            f"{user.id}/{job.id}/{name}",
+            CopySource(bucket, f"{entry['user_id']}/{entry['job_id']}/{name}")
+        )
+
+    result = source.result
+    await db.execute(detections.copy_detections(source.id, job.id, user.id))
+    job.status = "succeeded"
+    job.result = result
+    await db.commit()
+    try:
+        await events.publish(redis, user.id, job.id, "succeeded", result)
+    except Exception as e:
+        logger.warning(f"Failed to publish job event: {e}", extra={"job_id": str(job.id)})
+    return True
+
+def input_path(user_id, job_id, content_type):
+    name = "input.pdf" if content_type in DOCUMENT_CONTENT_TYPES else "input.png"
+    return f"{user_id}/{job_id}/{name}"
+
+def pdf_page_count(source):
+    """Pages in a PDF (bytes or a seekable file); only the document's page tree is read."""
+    try:
+        pdf = pdfium.PdfDocument(source)
+    except pdfium.PdfiumError:
+        raise HTTPException(400, "Not a valid PDF")
+    try:
+        pages = len(pdf)
+    finally:
+        pdf.close()
+    if not 0 < pages <= PDF_MAX_PAGES:
+        raise HTTPException(400, f"PDFs must have between 1 and {PDF_MAX_PAGES} pages")
+    return pages
+
+async def use_result_cache(db, job, user, bucket, content_hash):
+    """Answer the job from an earlier one with identical input if possible; returns True if it was.
+    Otherwise this job is registered as the one producing results for the input."""
+    job_id = str(job.id)
+    cache_key = result_cache.cache_key(user.id, content_hash, job.model_name, job.model_version)
+    try:
+        entry = await result_cache.lookup(redis, cache_key)
+        if entry and await reuse_cached_result(db, job, user, bucket, entry):
+            await result_cache.record(redis, hit=True)
+            logger.info(
+                f"Job {job_id} served from result cache (source job {entry['job_id']})",
+                extra={"job_id": job_id, "user_id": str(user.id), "status": "succeeded", "model_version": job.model_version}
+            )
+            return True
+
+        await result_cache.record(redis, hit=False)
+        if entry:
+            source = (await db.execute(select(Job.status).where(Job.id == uuid.UUID(entry["job_id"])))).scalar()
+            if source is None or source == "failed":
+                await result_cache.evict(redis, cache_key)
+        await result_cache.store(redis, cache_key, {"job_id": job_id, "user_id": str(user.id)})
+    except Exception as e:
+        # The cache is an optimisation only; fall back to normal processing
+        await db.rollback()
+        logger.warning(f"Result cache unavailable: {e}", extra={"job_id": job_id, "user_id": str(user.id)})
+    return False
+
+def check_priority(priority):
+    if priority not in job_queue.PRIORITY_CLASSES:
+        raise HTTPException(400, f"priority must be one of {', '.join(job_queue.PRIORITY_CLASSES)}")
+
+async def enqueue_job(job_id, user_id, bucket, path, model_name, model_version, priority=job_queue.DEFAULT_PRIORITY, pages=None, cache=False):
+    payload = {
+        "job_id": job_id,
+        "user_id": str(user_id),
+        "bucket": bucket,
+        "path": path,
+        "priority": priority,
+        "enqueued_at": time.time()
+    }
+    if pages:
+        # The worker refuses a document whose page count differs from the one admitted
+        payload["type"] = "document"
+        payload["pages"] = pages
+    if cache:
+        # The API never read the input, so the worker checks the result cache once it has
+        payload["result_cache"] = True
+        payload["model_name"] = model_name
+        payload["model_version"] = model_version
+    await job_queue.enqueue(redis, user_id, priority, json.dumps(payload))
+    await events.publish(redis, user_id, job_id, "queued")
+    
+    logger.info(
+        f"Job {job_id} queued for user {user_id} ({priority} priority)", 
+        extra={
+            "job_id": job_id, 
+            "user_id": str(user_id), 
+            "status": "queued",
+            "model_version": model_version
+        }
+    )
+
 @router.post("/jobs")
-def create_job(
+async def create_job(
     file: UploadFile = File(...),
-    user=Depends(get_current_user)
+    priority: str = Query(job_queue.DEFAULT_PRIORITY),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    if file.content_type not in ["image/png", "image/jpeg"]:
+    check_priority(priority)
+    if file.content_type not in ALLOWED_CONTENT_TYPES + DOCUMENT_CONTENT_TYPES:
         logger.warning(f"Invalid file type attempted: {file.content_type}", extra={"user_id": str(user.id)})
-        raise HTTPException(400, "Only PNG/JPG allowed")
+        raise HTTPException(400, "Only PNG/JPG/PDF allowed")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(413, f"Files must be at most {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    document = file.content_type in DOCUMENT_CONTENT_TYPES
+    pages = None
+    if document:
+        pages = await run_in_threadpool(pdf_page_count, file.file)
+        await run_in_threadpool(file.file.seek, 0)
+
+    # Refuse before anything is stored; a document counts one job per page. Capacity is
+    # checked first, so a request refused for it keeps the user's tokens.
+    estimated_wait = await admission.admit(redis, pages or 1)
+    await admission.check_rate_limit(redis, user.id, pages or 1)
 
     job_id = str(uuid.uuid4())
-    db = SessionLocal()
 
     model_name = os.getenv("MODEL_NAME")
     model_version = os.getenv("MODEL_VERSION")
 
     job = Job(
-        id=job_id,
+        id=uuid.UUID(job_id),
         user_id=user.id,
         status="queued",
         model_name=model_name,
         model_version=model_version
     )
     db.add(job)
-    db.commit()
+    await db.commit()
 
     bucket = os.getenv("MINIO_BUCKET")
-    path = f"{user.id}/{job_id}/input.png"
+    path = input_path(user.id, job_id, file.content_type)
 
+    # Hash the upload while it streams to MinIO
+    reader = result_cache.HashingReader(file.file)
     try:
-        minio_client.put_object(
+        await run_in_threadpool(
+            minio_client.put_object,
             bucket,
             path,
-            file.file,
+            reader,
             length=-1,
             part_size=10*1024*1024,
             content_type=file.content_type
         )
     except Exception as e:
         logger.error(f"Failed to upload to MinIO: {e}", extra={"job_id": job_id, "user_id": str(user.id)})
+        await admission.refund_rate_limit(redis, user.id, pages or 1)
         raise HTTPException(500, "Storage error")
 
-    payload = {
+    # Identical input already processed by this model: reuse its results. Documents
+    # bypass the cache, since their detections belong to their page sub-jobs.
+    if not document and await use_result_cache(db, job, user, bucket, reader.hexdigest()):
+        return {"job_id": job_id, "status": "succeeded", "cached": True}
+
+    await enqueue_job(job_id, user.id, bucket, path, model_name, model_version, priority, pages)
+
+    return {"job_id": job_id, "status": "queued", "estimated_wait": estimated_wait}
+
+def batch_inputs(files):
+    """(filename, content type, opener, length) for every image in the request; zip
+    archives are expanded to their PNG/JPG members without extracting them to disk."""
+    inputs = []
+    for file in files:
+        if file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(file.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(400, f"{file.filename} is not a valid zip archive")
+            for member in archive.infolist():
+                content_type = IMAGE_EXTENSIONS.get(os.path.splitext(member.filename)[1].lower())
+                # Skip directories, other files and macOS resource forks
+                if member.is_dir() or content_type is None or member.filename.startswith("__MACOSX/"):
+                    continue
+                inputs.append((member.filename, content_type, lambda archive=archive, member=member: archive.open(member), member.file_size))
+        elif file.content_type in ALLOWED_CONTENT_TYPES:
+            inputs.append((file.filename, file.content_type, lambda file=file: file.file, -1))
+        else:
+            raise HTTPException(400, f"{file.filename}: only PNG/JPG or zip archives allowed")
+
+        if len(inputs) > BATCH_MAX_FILES:
+            raise HTTPException(400, f"At most {BATCH_MAX_FILES} images per batch")
+    if not inputs:
+        raise HTTPException(400, "No PNG/JPG images in the request")
+    return inputs
+
+@router.post("/jobs/batch")
+async def create_batch(
+    files: List[UploadFile] = File(...),
+    priority: str = Query(job_queue.DEFAULT_PRIORITY),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Submit many images (or zip archives of them) as one batch of jobs.
+
+    Inputs are streamed to storage concurrently, all job rows are inserted in one
+    transaction and all messages are enqueued in one pipelined Redis round trip.
+    """
+    check_priority(priority)
+    inputs = await run_in_threadpool(batch_inputs, files)
+
+    # Refuse before anything is stored; the whole batch counts against the limits
+    estimated_wait = await admission.admit(redis, len(inputs))
+    await admission.check_rate_limit(redis, user.id, len(inputs))
+
+    batch_id = uuid.uuid4()
+    model_name = os.getenv("MODEL_NAME")
+    model_version = os.getenv("MODEL_VERSION")
+    bucket = os.getenv("MINIO_BUCKET")
+    job_ids = [str(uuid.uuid4()) for _ in inputs]
+    paths = [f"{user.id}/{job_id}/input.png" for job_id in job_ids]
+
+    # Release the pooled connection while the uploads run
+    await db.close()
+
+    uploads = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    def put(path, content_type, open_input, length):
+        with open_input() as stream:
+            minio_client.put_object(bucket, path, stream, length=length, part_size=10*1024*1024, content_type=content_type)
+    async def upload(path, content_type, open_input, length):
+        async with uploads:
+            await run_in_threadpool(put, path, content_type, open_input, length)
+
+    try:
+        await asyncio.gather(*[
+            upload(path, content_type, open_input, length)
+            for path, (_, content_type, open_input, length) in zip(paths, inputs)
+        ])
+    except Exception as e:
+        logger.error(f"Failed to upload batch {batch_id} to MinIO: {e}", extra={"user_id": str(user.id)})
+        await admission.refund_rate_limit(redis, user.id, len(inputs))
+        raise HTTPException(500, "Storage error")
+
+    db.add_all([
+        Job(
+            id=uuid.UUID(job_id),
+            user_id=user.id,
+            status="queued",
+            model_name=model_name,
+            model_version=model_version,
+            batch_id=batch_id
+        )
+        for job_id in job_ids
+    ])
+    await db.commit()
+
+    enqueued_at = time.time()
+    await job_queue.enqueue_many(redis, [
+        (user.id, priority, json.dumps({
+            "job_id": job_id,
+            "user_id": str(user.id),
+            "bucket": bucket,
+            "path": path,
+            "priority": priority,
+            "enqueued_at": enqueued_at
+        }))
+        for job_id, path in zip(job_ids, paths)
+    ])
+    await events.publish_many(redis, user.id, job_ids, "queued")
+
+    logger.info(
+        f"Batch {batch_id} of {len(job_ids)} jobs queued for user {user.id} ({priority} priority)",
+        extra={"user_id": str(user.id), "status": "queued", "model_version": model_version}
+    )
+
+    return {
+        "batch_id": str(batch_id),
+        "status": "queued",
+        "count": len(job_ids),
+        "jobs": [{"job_id": job_id, "filename": filename} for job_id, (filename, _, _, _) in zip(job_ids, inputs)],
+        "estimated_wait": estimated_wait
+    }
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: uuid.UUID, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Job counts by status for a batch; status is "completed" once every job has finished."""
+    rows = (await db.execute(
+        select(Job.status, func.count()).where(Job.batch_id == batch_id, Job.user_id == user.id).group_by(Job.status)
+    )).all()
+    if not rows:
+        raise HTTPException(404, "Batch not found")
+
+    counts = {status: count for status, count in rows}
+    total = sum(counts.values())
+    finished = sum(counts.get(status, 0) for status in FINAL_STATUSES)
+    return {
+        "batch_id": str(batch_id),
+        "status": "completed" if finished == total else "processing",
+        "total": total,
+        "finished": finished,
+        "counts": counts
+    }
+
+async def reap_stale_uploads(db, user):
+    """Delete the user's direct uploads that were never committed, and whatever was stored for them."""
+    cutoff = datetime.now(timezone.utc) - UPLOAD_COMMIT_TIMEOUT
+    stale = (await db.execute(
+        delete(Job)
+        .where(Job.user_id == user.id, Job.status == "awaiting_upload", Job.created_at < cutoff)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    await db.commit()
+    if not stale:
+        return
+
+    bucket = os.getenv("MINIO_BUCKET")
+    objects = [DeleteObject(f"{user.id}/{job_id}/{name}") for job_id in stale for name in ("input.png", "input.pdf")]
+    try:
+        # remove_objects is lazy: errors are only reported while iterating
+        errors = await run_in_threadpool(lambda: list(minio_client.remove_objects(bucket, objects)))
+    except Exception as e:
+        errors = [e]
+    for error in errors:
+        logger.warning(f"Failed to delete abandoned upload: {error}", extra={"user_id": str(user.id)})
+    logger.info(f"Deleted {len(stale)} uncommitted uploads", extra={"user_id": str(user.id)})
+
+@router.post("/jobs/uploads")
+async def create_upload(request: UploadRequest, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Start a direct-to-storage upload: the client POSTs the file with fields to upload_url, then calls commit."""
+    if request.content_type not in ALLOWED_CONTENT_TYPES + DOCUMENT_CONTENT_TYPES:
+        logger.warning(f"Invalid file type attempted: {request.content_type}", extra={"user_id": str(user.id)})
+        raise HTTPException(400, "Only PNG/JPG/PDF allowed")
+
+    # Admission is decided here, before the client uploads, rather than at commit
+    await admission.admit(redis)
+    await admission.check_rate_limit(redis, user.id)
+
+    job_id = str(uuid.uuid4())
+    job = Job(
+        id=uuid.UUID(job_id),
+        user_id=user.id,
+        status="awaiting_upload",
+        model_name=os.getenv("MODEL_NAME"),
+        model_version=os.getenv("MODEL_VERSION")
+    )
+    db.add(job)
+    await db.commit()
+    await reap_stale_uploads(db, user)
+
+    # A POST policy rather than a presigned PUT, so storage itself refuses larger files
+    bucket = os.getenv("MINIO_BUCKET")
+    path = input_path(user.id, job_id, request.content_type)
+    policy = PostPolicy(bucket, datetime.now(timezone.utc) + PRESIGNED_URL_EXPIRY)
+    policy.add_equals_condition("key", path)
+    policy.add_equals_condition("Content-Type", request.content_type)
+    policy.add_content_length_range_condition(1, MAX_UPLOAD_BYTES)
+    fields = presign_client.presigned_post_policy(policy)
+
+    return {
         "job_id": job_id,
-        "user_id": str(user.id),
-        "bucket": bucket,
-        "path": path
+        "upload_url": f"{'https' if MINIO_PUBLIC_SECURE else 'http'}://{MINIO_PUBLIC_ENDPOINT}/{bucket}",
+        "method": "POST",
+        # Form fields to send before the file field
+        "fields": {**fields, "key": path, "Content-Type": request.content_type},
+        "max_bytes": MAX_UPLOAD_BYTES,
+        "expires_in": int(PRESIGNED_URL_EXPIRY.total_seconds())
     }
-    redis.lpush("job_queue", json.dumps(payload))
-    
-    logger.info(
-        f"Job {job_id} queued for user {user.id}", 
-        extra={
-            "job_id": job_id, 
-            "user_id": str(user.id), 
-            "status": "queued",
-            "model_version": model_version
-        }
+
+@router.post("/jobs/{job_id}/commit")
+async def commit_upload(
+    job_id: uuid.UUID,
+    priority: str = Query(job_queue.DEFAULT_PRIORITY),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a job whose input was uploaded directly to storage."""
+    check_priority(priority)
+    job = await get_user_job(db, job_id, user)
+
+    if job.status != "awaiting_upload":
+        raise HTTPException(409, f"Job already {job.status}")
+
+    # Images and documents are stored under different names (see input_path)
+    bucket = os.getenv("MINIO_BUCKET")
+    for path in (f"{user.id}/{job_id}/input.png", f"{user.id}/{job_id}/input.pdf"):
+        try:
+            stat = await run_in_threadpool(minio_client.stat_object, bucket, path)
+            break
+        except S3Error:
+            continue
+    else:
+        raise HTTPException(400, "Upload not found")
+
+    pages = None
+    if path.endswith(".pdf"):
+        # Only the parts pdfium reads are fetched, in STORED_READ_SIZE ranges
+        stored = io.BufferedReader(StoredObject(bucket, path, stat.size), buffer_size=STORED_READ_SIZE)
+        pages = await run_in_threadpool(pdf_page_count, stored)
+        # create_upload took one job's worth; the remaining pages are charged before queueing
+        await admission.admit(redis, pages)
+        if pages > 1:
+            await admission.check_rate_limit(redis, user.id, pages - 1)
+
+    # Only one commit may move the job out of awaiting_upload
+    updated = await db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "awaiting_upload").values(status="queued")
     )
+    await db.commit()
+    if not updated.rowcount:
+        # The other commit queues the document; give back the pages charged here
+        if pages and pages > 1:
+            await admission.refund_rate_limit(redis, user.id, pages - 1)
+        raise HTTPException(409, "Job already committed")
+
+    # The upload bypassed the API, so the worker hashes the input it downloads and checks
+    # the result cache there; documents bypass the cache, as in create_job
+    _, _, estimated_wait = await admission.estimate(redis)
+    await enqueue_job(str(job_id), user.id, bucket, path, job.model_name, job.model_version, priority, pages, cache=pages is None)
+
+    return {"job_id": str(job_id), "status": "queued", "estimated_wait": estimated_wait}
+
+@router.get("/jobs", response_model=JobPage, response_model_exclude_unset=True)
+async def get_jobs(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    include_result: bool = False,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Newest-first keyset pagination over (created_at, id); pass next_cursor to get the following page.
 
-    return {"job_id": job_id, "status": "queued"}
+    Page sub-jobs are listed under their document (/jobs/{id}/pages), not here, and
+    direct uploads only once they have been committed.
+    """
+    columns = [Job.id, Job.status, Job.model_name, Job.model_version, Job.created_at]
+    if include_result:
+        columns.append(Job.result)
 
-@router.get("/jobs")
-def get_jobs(user=Depends(get_current_user)):
-    db = SessionLocal()
-    jobs = db.query(Job).filter(Job.user_id == user.id).order_by(Job.created_at.desc()).all()
-    return jobs
+    query = select(*columns).where(Job.user_id == user.id, Job.parent_id.is_(None), Job.status != "awaiting_upload")
+    if status:
+        query = query.where(Job.status == status)
+    if cursor:
+        query = query.where(tuple_(Job.created_at, Job.id) < tuple_(*decode_cursor(cursor)))
+
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.execute(query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return JobPage(items=[JobSummary(**row._asdict()) for row in rows], next_cursor=next_cursor)
+
+@router.get("/jobs/events")
+async def stream_job_events(request: Request, user=Depends(get_stream_user)):
+    """Server-sent job status transitions for the current user; replaces client polling."""
+    return StreamingResponse(
+        events.stream(request, redis, user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/jobs/{job_id}")
-def get_job(job_id: str, user=Depends(get_current_user)):
-    db = SessionLocal()
-    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id).first()
-    if not job:
-        raise HTTPException(404, "Job not found")
-    return job
+async def get_job(job_id: uuid.UUID, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return await get_user_job(db, job_id, user)
+
+@router.get("/jobs/{job_id}/pages")
+async def get_job_pages(job_id: uuid.UUID, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Per-page status and results of a PDF document, in page order; empty until the worker has split it."""
+    await get_user_job(db, job_id, user)
+    rows = (await db.execute(
+        select(Job.id, Job.page, Job.status, Job.result).where(Job.parent_id == job_id, Job.user_id == user.id).order_by(Job.page)
+    )).all()
+    return {
+        "job_id": str(job_id),
+        "pages": [{"page": row.page, "job_id": str(row.id), "status": row.status, "result": row.result} for row in rows]
+    }
 
 @router.get("/jobs/{job_id}/overlay")
-def get_job_overlay(job_id: str, user=Depends(get_current_user)):
-    db = SessionLocal()
-    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id).first()
-    if not job:
-        raise HTTPException(404, "Job not found")
+async def get_job_overlay(job_id: uuid.UUID, request: Request, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = await get_user_job(db, job_id, user)
     
     if job.status != "succeeded":
         raise HTTPException(400, "Job not completed yet")
 
+    # Release the pooled connection before a potentially long download
+    await db.close()
+
     bucket = os.getenv("MINIO_BUCKET")
-    path = f"{user.id}/{job_id}/overlay.png"
+    name = artifact_names(job.result)["overlay"]
+    path = f"{user.id}/{job_id}/{name}"
+    return await stream_object(request, bucket, path, artifact_media_type(name), "Overlay not found")
 
-    try:
-        response = minio_client.get_object(bucket, path)
-        try:
-            return StreamingResponse(io.BytesIO(response.read()), media_type="image/png")
-        finally:
-            response.close()
-            response.release_conn()
-    except Exception as e:
-        print(f"Error fetching overlay: {e}")
-        raise HTTPException(404, "Overlay not found")
+async def presigned_artifact_url(job_id, user, db, artifact, download=False):
+    job = await get_user_job(db, job_id, user)
+
+    if job.status != "succeeded":
+        raise HTTPException(400, "Job not completed yet")
+
+    name = artifact_names(job.result)[artifact]
+    stem, extension = os.path.splitext(name)
+    filename = f"{stem}-{job_id}{extension}"
+    headers = {"response-content-disposition": f"attachment; filename={filename}"} if download else None
+
+    bucket = os.getenv("MINIO_BUCKET")
+    url = presign_client.presigned_get_object(
+        bucket,
+        f"{user.id}/{job_id}/{name}",
+        expires=PRESIGNED_URL_EXPIRY,
+        response_headers=headers
+    )
+    return {"url": url, "expires_in": int(PRESIGNED_URL_EXPIRY.total_seconds()), "filename": filename}
+
+@router.get("/jobs/{job_id}/overlay/url")
+async def get_job_overlay_url(job_id: uuid.UUID, download: bool = False, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Short-lived URL for fetching the overlay directly from storage."""
+    return await presigned_artifact_url(job_id, user, db, "overlay", download)
+
+@router.get("/jobs/{job_id}/overlay/sizes/{size}")
+async def get_job_overlay_size(job_id: uuid.UUID, size: str, request: Request, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """The overlay at one of the worker's pre-rendered sizes.
+
+    Artifacts never change once written, so responses are cacheable for a year. Clients
+    fetch it with the Authorization header rather than as a plain <img> URL, which keeps
+    the token out of URLs, logs and Referer headers.
+    """
+    if size not in OVERLAY_SIZES:
+        raise HTTPException(400, f"size must be one of {', '.join(OVERLAY_SIZES)}")
+
+    job = await get_user_job(db, job_id, user)
+    if job.status != "succeeded":
+        raise HTTPException(400, "Job not completed yet")
+
+    names = artifact_names(job.result)
+    name = names.get("overlay" if size == "full" else size)
+    if name is None:
+        raise HTTPException(404, "Overlay size not available for this job")
+
+    await db.close()
+
+    bucket = os.getenv("MINIO_BUCKET")
+    path = f"{user.id}/{job_id}/{name}"
+    return await stream_object(request, bucket, path, artifact_media_type(name), "Overlay not found")
+
+@router.get("/jobs/{job_id}/csv/url")
+async def get_job_csv_url(job_id: uuid.UUID, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """Short-lived URL for fetching the CSV directly from storage."""
+    return await presigned_artifact_url(job_id, user, db, "csv", download=True)
 
 @router.get("/jobs/{job_id}/csv")
-def get_job_csv(job_id: str, user=Depends(get_current_user)):
-    db = SessionLocal()
-    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user.id).first()
-    if not job:
-        raise HTTPException(404, "Job not found")
+async def get_job_csv(job_id: uuid.UUID, request: Request, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    job = await get_user_job(db, job_id, user)
     
     if job.status != "succeeded":
         raise HTTPException(400, "Job not completed yet")
 
+    await db.close()
+
     bucket = os.getenv("MINIO_BUCKET")
     path = f"{user.id}/{job_id}/results.csv"
-
-    try:
-        response = minio_client.get_object(bucket, path)
-        # return content for download/parsing
-        try:
-            return StreamingResponse(
-                io.BytesIO(response.read()), 
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=results-{job_id}.csv"}
-            )
-        finally:
-            response.close()
-            response.release_conn()
-    except Exception as e:
-        print(f"Error fetching CSV: {e}")
-        raise HTTPException(404, "CSV results not found")
+    return await stream_object(
+        request, bucket, path, "text/csv", "CSV results not found",
+        headers={"Content-Disposition": f"attachment; filename=results-{job_id}.csv"}
+    )
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
-from app import models
+from app import models, migrations
 from app.database import engine
 from app.health import router as health_router
 from app.jobs import router as jobs_router
+from app.detections import router as detections_router
 from app.auth_routes import router as auth_router
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -12,6 +13,8 @@ load_dotenv()
 # Create database tables
 # models.Base.metadata.drop_all(bind=engine) # Uncomment if you need to reset the DB
 models.Base.metadata.create_all(bind=engine)
+# Columns and indexes added to tables that already existed
+migrations.upgrade(engine)
 
 
 app = FastAPI()
@@ -28,6 +31,7 @@ app.add_middleware(
 app.include_router(health_router)
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 app.include_router(jobs_router, prefix="/api")
+app.include_router(detections_router, prefix="/api")
 
 
 from app.logger import setup_logger
@@ -78,6 +82,11 @@ def startup_event():
         logger.error(f"Startup Error (MinIO): {e}")
 
 
+@app.on_event("shutdown")
+def shutdown_event():
+    from app import passwords
+    passwords.shutdown()
+
 
 @app.get("/")
 def read_root():
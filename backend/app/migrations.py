@@ -0,0 +1,33 @@
+from sqlalchemy import text
+from app.logger import setup_logger
+
+logger = setup_logger("backend-migrations", "backend")
+
+# create_all() only creates missing tables. Columns and indexes added to existing tables
+# since then are added (or replaced) here. Every statement is idempotent, so this runs at
+# each startup.
+UPGRADES = [
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS batch_id UUID",
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS parent_id UUID REFERENCES jobs (id) ON DELETE CASCADE",
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS page INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_user_id_created_at_id_top_level ON jobs (user_id, created_at, id) WHERE parent_id IS NULL",
+    # Superseded by the partial index above
+    "DROP INDEX IF EXISTS ix_jobs_user_id_created_at_id",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_batch_id ON jobs (batch_id)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_parent_id_page ON jobs (parent_id, page)",
+    "CREATE INDEX IF NOT EXISTS ix_detections_job_id_id ON detections (job_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_detections_user_id_label_job_id ON detections (user_id, label, job_id)",
+]
+
+# Every API process runs the upgrade at startup; the lock makes them take turns
+MIGRATION_LOCK_ID = 7305001
+
+
+def upgrade(engine):
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        for statement in UPGRADES:
+            conn.execute(text(statement))
+    logger.info(f"Startup: schema upgrades applied ({len(UPGRADES)} statements)")
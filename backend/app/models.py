@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, BigInteger, Float, Integer, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -24,3 +24,44 @@ class Job(Base):
     model_version = Column(String)
     result = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set for jobs submitted together through POST /api/jobs/batch
+    batch_id = Column(UUID(as_uuid=True), nullable=True)
+    # Page sub-jobs of a PDF document (created by the worker): the document's job and the 1-based page
+    parent_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=True)
+    page = Column(Integer, nullable=True)
+
+    # Serve the keyset-paginated job listing, the batch status lookup and a document's
+    # page listing. The listing only shows top-level jobs, so its index leaves out page
+    # sub-jobs, which are created after their document and would sort as the newest.
+    # create_all() only creates them (and batch_id, parent_id and page) for new tables;
+    # app/migrations.py adds them to existing databases.
+    __table_args__ = (
+        Index(
+            "ix_jobs_user_id_created_at_id_top_level", "user_id", "created_at", "id",
+            postgresql_where=text("parent_id IS NULL")
+        ),
+        Index("ix_jobs_batch_id", "batch_id"),
+        Index("ix_jobs_parent_id_page", "parent_id", "page"),
+    )
+
+
+class Detection(Base):
+    __tablename__ = "detections"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    # Denormalized from jobs so per-user aggregates don't need a join
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    label = Column(String, nullable=False)
+    confidence = Column(Float, nullable=False)
+    x1 = Column(Float, nullable=False)
+    y1 = Column(Float, nullable=False)
+    x2 = Column(Float, nullable=False)
+    y2 = Column(Float, nullable=False)
+
+    # (job_id, id) serves the paginated per-job listing; (user_id, label, job_id)
+    # answers per-user counts by label from the index alone
+    __table_args__ = (
+        Index("ix_detections_job_id_id", "job_id", "id"),
+        Index("ix_detections_user_id_label_job_id", "user_id", "label", "job_id"),
+    )
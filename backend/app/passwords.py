@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt cost factor. Hashes stored with a different cost are rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt runs in its own processes so a burst of logins can't starve the API threadpool or event loop
+PASSWORD_HASH_WORKERS = max(1, int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))))
+# Hash/verify calls allowed in flight or waiting per API process; beyond this requests get a 503
+PASSWORD_HASH_QUEUE_LIMIT = max(1, int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", str(4 * PASSWORD_HASH_WORKERS))))
+RETRY_AFTER_SECONDS = 1
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = None
+_pending = 0
+_rejected = 0
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify(password, password_hash):
+    # Returns (matches, new_hash); new_hash is set when the stored cost is out of date
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the API process already runs an event loop and driver threads
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _submit(fn, *args):
+    global _pending, _rejected
+    if _pending >= PASSWORD_HASH_QUEUE_LIMIT:
+        _rejected += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication is busy, please retry",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password):
+    return await _submit(_hash, password)
+
+
+async def verify_password(password, password_hash):
+    return await _submit(_verify, password, password_hash)
+
+
+def stats():
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "pending": _pending,
+        "rejected": _rejected,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+    }
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import time
+
+# Results of an upload are reused for identical bytes processed by the same model.
+# Entries expire after RESULT_CACHE_TTL_SECONDS and at most RESULT_CACHE_MAX_ENTRIES are kept.
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+# Entries are per user, so a hit never tells one tenant that another uploaded the same
+# drawing. RESULT_CACHE_SHARED=true shares them across users.
+RESULT_CACHE_SHARED = os.getenv("RESULT_CACHE_SHARED", "false").lower() == "true"
+
+KEY_PREFIX = "result_cache"
+INDEX_KEY = f"{KEY_PREFIX}:index"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+
+
+class HashingReader:
+    """File-like wrapper that hashes the upload as MinIO reads it."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def cache_key(user_id, content_hash, model_name, model_version):
+    scope = "shared" if RESULT_CACHE_SHARED else user_id
+    return f"{KEY_PREFIX}:{scope}:{content_hash}:{model_name}:{model_version}"
+
+
+async def lookup(redis, key):
+    entry = await redis.get(key)
+    if entry is None:
+        return None
+    return json.loads(entry)
+
+
+async def store(redis, key, entry):
+    """Register the job that will produce results for this key, unless one already is."""
+    if not await redis.set(key, json.dumps(entry), nx=True, ex=RESULT_CACHE_TTL_SECONDS):
+        return False
+
+    now = time.time()
+    pipe = redis.pipeline()
+    pipe.zadd(INDEX_KEY, {key: now})
+    # Forget index entries whose keys have already expired
+    pipe.zremrangebyscore(INDEX_KEY, 0, now - RESULT_CACHE_TTL_SECONDS)
+    pipe.zcard(INDEX_KEY)
+    size = (await pipe.execute())[-1]
+
+    # Evict the oldest entries once over the size bound
+    overflow = size - RESULT_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted = [member for member, _ in await redis.zpopmin(INDEX_KEY, overflow)]
+        if evicted:
+            await redis.delete(*evicted)
+    return True
+
+
+async def evict(redis, key):
+    pipe = redis.pipeline()
+    pipe.delete(key)
+    pipe.zrem(INDEX_KEY, key)
+    await pipe.execute()
+
+
+async def record(redis, hit):
+    await redis.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+
+
+async def stats(redis):
+    counters = await redis.hgetall(STATS_KEY)
+    hits = int(counters.get(b"hits", 0))
+    misses = int(counters.get(b"misses", 0))
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+        "size": await redis.zcard(INDEX_KEY),
+        "max_entries": RESULT_CACHE_MAX_ENTRIES,
+        "ttl_seconds": RESULT_CACHE_TTL_SECONDS,
+    }
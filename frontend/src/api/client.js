@@ -20,3 +20,36 @@ export const setAuthToken = (token) => {
     delete api.defaults.headers.common["Authorization"];
   }
 };
+
+// Subscribe to job status transitions pushed by the backend (server-sent events).
+// EventSource cannot send headers, so the token is passed as a query parameter.
+// onOpen fires on every (re)connect, so callers can resync events missed while
+// disconnected. Callers load their data separately: a stream refused with 401
+// (expired token) never opens.
+export const subscribeToJobEvents = (onEvent, onOpen) => {
+  const token = localStorage.getItem("token") || "";
+  const source = new EventSource(`/api/jobs/events?token=${encodeURIComponent(token)}`);
+  source.addEventListener("status", (e) => onEvent(JSON.parse(e.data)));
+  if (onOpen) {
+    source.onopen = onOpen;
+  }
+  return source;
+};
+
+// Object URL of a job's overlay at a pre-rendered size (thumbnail, medium or full).
+// Fetched with the Authorization header, so the token never appears in a URL; the
+// browser's HTTP cache still serves repeat requests, so each image is downloaded once.
+// Callers revoke the URL with URL.revokeObjectURL once the image is no longer shown.
+export const fetchOverlayImage = async (jobId, size) => {
+  const res = await api.get(`/api/jobs/${jobId}/overlay/sizes/${size}`, { responseType: "blob" });
+  return URL.createObjectURL(res.data);
+};
+
+// Whether the worker stored this size for a finished job (older results have no derivatives)
+export const hasOverlaySize = (result, size) => {
+  try {
+    return Boolean(JSON.parse(result)?.artifacts?.[size]);
+  } catch (e) {
+    return false;
+  }
+};
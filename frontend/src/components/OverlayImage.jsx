@@ -0,0 +1,29 @@
+import { useEffect, useState } from "react";
+import { fetchOverlayImage } from "../api/client";
+
+// <img> for a job's overlay at a pre-rendered size, loaded through the authenticated API
+export default function OverlayImage({ jobId, size, ...props }) {
+    const [src, setSrc] = useState(null);
+
+    useEffect(() => {
+        let cancelled = false;
+        let objectUrl = null;
+        fetchOverlayImage(jobId, size)
+            .then((url) => {
+                if (cancelled) {
+                    URL.revokeObjectURL(url);
+                    return;
+                }
+                objectUrl = url;
+                setSrc(url);
+            })
+            .catch((err) => console.error("Failed to load overlay:", err));
+
+        return () => {
+            cancelled = true;
+            if (objectUrl) URL.revokeObjectURL(objectUrl);
+        };
+    }, [jobId, size]);
+
+    return src ? <img src={src} {...props} /> : null;
+}
@@ -1,14 +1,17 @@
 import { useEffect, useState } from "react";
 import { useParams, Link } from "react-router-dom";
-import { api } from "../api/client";
+import { api, subscribeToJobEvents, hasOverlaySize } from "../api/client";
+import OverlayImage from "../components/OverlayImage";
 
 export default function JobDetail() {
     const { jobId } = useParams();
     const [job, setJob] = useState(null);
     const [overlayUrl, setOverlayUrl] = useState(null);
-    const [csvData, setCsvData] = useState([]);
+    const [detections, setDetections] = useState([]);
+    const [detectionsCursor, setDetectionsCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
-    const [polling, setPolling] = useState(true);
+    const [listening, setListening] = useState(true);
 
     const fetchJobStatus = async () => {
         try {
@@ -16,53 +19,76 @@ export default function JobDetail() {
             setJob(res.data);
 
             if (res.data.status === "succeeded") {
-                setPolling(false);
-                fetchResults();
+                setListening(false);
+                fetchResults(res.data.result);
             } else if (res.data.status === "failed") {
-                setPolling(false);
+                setListening(false);
                 setError("Job failed during processing.");
             }
         } catch (err) {
             console.error("Error fetching job:", err);
             setError("Failed to load job details.");
-            setPolling(false);
+            setListening(false);
         }
     };
 
-    const fetchResults = async () => {
+    const fetchResults = async (result) => {
         try {
-            // Fetch Overlay Image
-            const imgRes = await api.get(`/api/jobs/${jobId}/overlay`, { responseType: 'blob' });
-            const imgUrl = URL.createObjectURL(imgRes.data);
-            setOverlayUrl(imgUrl);
-
-            // Fetch CSV Data
-            const csvRes = await api.get(`/api/jobs/${jobId}/csv`, { responseType: 'text' });
-            parseCSV(csvRes.data);
+            // The page shows the medium-size overlay (cached by the browser); results
+            // without one read the full overlay directly from storage via a short-lived URL
+            if (!hasOverlaySize(result, "medium")) {
+                const { data: overlay } = await api.get(`/api/jobs/${jobId}/overlay/url`);
+                setOverlayUrl(overlay.url);
+            }
+
+            // Detections are paged from the database instead of parsing the whole CSV
+            const { data: page } = await api.get(`/api/jobs/${jobId}/detections`);
+            setDetections(page.items);
+            setDetectionsCursor(page.next_cursor);
         } catch (err) {
             console.error("Error fetching results:", err);
             // Don't fail the whole page if results are missing, just log it.
         }
     };
 
-    const parseCSV = (text) => {
-        const lines = text.split("\n").filter(line => line.trim() !== "");
-        if (lines.length > 0) {
-            const parsed = lines.map(line => line.split(","));
-            setCsvData(parsed);
+    const fetchMoreDetections = async () => {
+        setLoadingMore(true);
+        try {
+            const { data: page } = await api.get(`/api/jobs/${jobId}/detections`, { params: { cursor: detectionsCursor } });
+            setDetections((prev) => [...prev, ...page.items]);
+            setDetectionsCursor(page.next_cursor);
+        } catch (err) {
+            console.error("Error fetching detections:", err);
+        } finally {
+            setLoadingMore(false);
         }
     };
 
+    // Loaded on mount rather than when the stream opens, so an expired token still
+    // shows an error instead of leaving the page loading
     useEffect(() => {
         fetchJobStatus();
-        const interval = setInterval(() => {
-            if (polling) {
-                fetchJobStatus();
+    }, [jobId]);
+
+    useEffect(() => {
+        if (!listening) return;
+
+        // Wait for pushed status transitions instead of polling; re-read the job
+        // whenever the stream (re)connects in case an event was missed.
+        const source = subscribeToJobEvents((event) => {
+            if (event.job_id !== jobId) return;
+            setJob((prev) => prev && { ...prev, status: event.status, result: event.result ?? prev.result });
+            if (event.status === "succeeded") {
+                setListening(false);
+                fetchResults(event.result);
+            } else if (event.status === "failed") {
+                setListening(false);
+                setError("Job failed during processing.");
             }
-        }, 3000);
+        }, fetchJobStatus);
 
-        return () => clearInterval(interval);
-    }, [jobId, polling]);
+        return () => source.close();
+    }, [jobId, listening]);
 
     const downloadFile = (url, filename) => {
         const a = document.createElement('a');
@@ -73,18 +99,24 @@ export default function JobDetail() {
         document.body.removeChild(a);
     };
 
+    // Presigned download URLs carry a Content-Disposition: attachment, so the browser saves them directly
     const downloadCSV = () => {
-        // Re-construct CSV for download or fetch again as blob
-        api.get(`/api/jobs/${jobId}/csv`, { responseType: 'blob' })
-            .then((res) => {
-                const url = URL.createObjectURL(res.data);
-                downloadFile(url, "results.csv");
-            })
+        api.get(`/api/jobs/${jobId}/csv/url`)
+            .then((res) => downloadFile(res.data.url, res.data.filename))
+            .catch(err => console.error("Download failed", err));
+    };
+
+    const downloadOverlay = () => {
+        api.get(`/api/jobs/${jobId}/overlay/url`, { params: { download: true } })
+            .then((res) => downloadFile(res.data.url, res.data.filename))
             .catch(err => console.error("Download failed", err));
     };
 
     if (!job) return <div className="loading-spinner">Loading job details...</div>;
 
+    // Detections of a PDF document carry the page they were found on
+    const multiPage = detections.some((detection) => detection.page != null);
+
     return (
         <div className="animate-fade-in">
             <div style={{ marginBottom: '2rem' }}>
@@ -111,10 +143,14 @@ export default function JobDetail() {
                 <>
                     <div className="card" style={{ marginBottom: '2rem' }}>
                         <h3 style={{ marginBottom: '1rem' }}>Overlay Preview</h3>
-                        {overlayUrl ? (
+                        {hasOverlaySize(job.result, "medium") || overlayUrl ? (
                             <div style={{ textAlign: 'center' }}>
-                                <img src={overlayUrl} alt="Analyzed Overlay" style={{ maxWidth: '100%', borderRadius: '0.5rem', marginBottom: '1rem' }} />
-                                <button onClick={() => downloadFile(overlayUrl, "overlay.png")} className="btn-primary">
+                                {hasOverlaySize(job.result, "medium") ? (
+                                    <OverlayImage jobId={jobId} size="medium" alt="Analyzed Overlay" style={{ maxWidth: '100%', borderRadius: '0.5rem', marginBottom: '1rem' }} />
+                                ) : (
+                                    <img src={overlayUrl} alt="Analyzed Overlay" style={{ maxWidth: '100%', borderRadius: '0.5rem', marginBottom: '1rem' }} />
+                                )}
+                                <button onClick={downloadOverlay} className="btn-primary">
                                     Download Overlay Image
                                 </button>
                             </div>
@@ -131,22 +167,22 @@ export default function JobDetail() {
                             </button>
                         </div>
 
-                        {csvData.length > 0 ? (
+                        {detections.length > 0 ? (
                             <div style={{ overflowX: 'auto' }}>
                                 <table style={{ width: '100%', borderCollapse: 'collapse', marginTop: '1rem' }}>
                                     <thead>
                                         <tr>
-                                            {csvData[0].map((header, i) => (
-                                                <th key={i} style={{ textAlign: 'left', padding: '0.75rem', borderBottom: '1px solid var(--border)', color: 'var(--text-muted)' }}>
+                                            {[...(multiPage ? ["Page"] : []), "Label", "Confidence", "X1", "Y1", "X2", "Y2"].map((header) => (
+                                                <th key={header} style={{ textAlign: 'left', padding: '0.75rem', borderBottom: '1px solid var(--border)', color: 'var(--text-muted)' }}>
                                                     {header}
                                                 </th>
                                             ))}
                                         </tr>
                                     </thead>
                                     <tbody>
-                                        {csvData.slice(1).map((row, i) => (
+                                        {detections.map((detection, i) => (
                                             <tr key={i}>
-                                                {row.map((cell, j) => (
+                                                {[...(multiPage ? [detection.page] : []), detection.label, detection.confidence.toFixed(2), ...detection.box.map(Math.round)].map((cell, j) => (
                                                     <td key={j} style={{ padding: '0.75rem', borderBottom: '1px solid var(--border)' }}>
                                                         {cell}
                                                     </td>
@@ -155,9 +191,16 @@ export default function JobDetail() {
                                         ))}
                                     </tbody>
                                 </table>
+                                {detectionsCursor && (
+                                    <div style={{ textAlign: 'center', marginTop: '1rem' }}>
+                                        <button onClick={fetchMoreDetections} disabled={loadingMore} className="btn-secondary">
+                                            {loadingMore ? "Loading..." : "Load more"}
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         ) : (
-                            <p>No valid CSV data found.</p>
+                            <p>No detections found.</p>
                         )}
                     </div>
                 </>
@@ -1,17 +1,27 @@
-import { useEffect, useState } from "react";
-import { api } from "../api/client";
+import { useEffect, useRef, useState } from "react";
+import { api, subscribeToJobEvents, hasOverlaySize } from "../api/client";
+import OverlayImage from "../components/OverlayImage";
 import { useNavigate } from "react-router-dom";
 
 export default function Jobs() {
     const [jobs, setJobs] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    // Latest list for the event handler, which is registered once
+    const jobsRef = useRef(jobs);
+    useEffect(() => {
+        jobsRef.current = jobs;
+    }, [jobs]);
 
     const navigate = useNavigate();
 
+    // Newest page of jobs; older pages are appended with "Load more"
     const fetchJobs = async () => {
         try {
-            const res = await api.get("/api/jobs");
-            setJobs(res.data);
+            const res = await api.get("/api/jobs", { params: { include_result: true } });
+            setJobs(res.data.items);
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             console.error("Failed to fetch jobs:", err);
         } finally {
@@ -19,12 +29,35 @@ export default function Jobs() {
         }
     };
 
+    const fetchMoreJobs = async () => {
+        setLoadingMore(true);
+        try {
+            const res = await api.get("/api/jobs", { params: { include_result: true, cursor: nextCursor } });
+            setJobs((prev) => [...prev, ...res.data.items]);
+            setNextCursor(res.data.next_cursor);
+        } catch (err) {
+            console.error("Failed to fetch more jobs:", err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchJobs();
 
-        // Polling every 3 seconds
-        const interval = setInterval(fetchJobs, 3000);
-        return () => clearInterval(interval);
+        // Status changes are pushed by the server; the list is only re-fetched
+        // when the stream (re)connects or a job we haven't seen appears.
+        const source = subscribeToJobEvents((event) => {
+            if (!jobsRef.current.some((job) => job.id === event.job_id)) {
+                fetchJobs();
+                return;
+            }
+            setJobs((prev) => prev.map((job) => job.id === event.job_id
+                ? { ...job, status: event.status, result: event.result ?? job.result }
+                : job));
+        }, fetchJobs);
+
+        return () => source.close();
     }, []);
 
     const formatResult = (job) => {
@@ -73,7 +106,7 @@ export default function Jobs() {
             <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '3rem' }}>
                 <h2 style={{ fontSize: '2.5rem', margin: 0 }}>Analysis History</h2>
                 <div style={{ fontSize: '0.875rem', color: 'var(--text-muted)' }}>
-                    Auto-refreshes every 3s
+                    Live updates
                 </div>
             </div>
 
@@ -98,6 +131,15 @@ export default function Jobs() {
                                 </span>
                             </div>
 
+                            {job.status === "succeeded" && hasOverlaySize(job.result, "thumbnail") && (
+                                <OverlayImage
+                                    jobId={job.id}
+                                    size="thumbnail"
+                                    alt="Overlay thumbnail"
+                                    style={{ width: '100%', height: '160px', objectFit: 'contain', borderRadius: '0.5rem', marginBottom: '1rem', background: 'var(--border)' }}
+                                />
+                            )}
+
                             <div style={{ flex: 1, marginBottom: '1.5rem' }}>
                                 <div style={{ fontSize: '0.75rem', color: 'var(--text-muted)', marginBottom: '0.5rem', letterSpacing: '0.05em' }}>DETECTION RESULTS</div>
                                 <div style={{ fontSize: '1rem', fontWeight: '500', minHeight: '3rem' }}>
@@ -130,6 +172,14 @@ export default function Jobs() {
                     ))}
                 </div>
             )}
+
+            {nextCursor && (
+                <div style={{ textAlign: 'center', marginTop: '2rem' }}>
+                    <button onClick={fetchMoreJobs} disabled={loadingMore} className="btn-secondary">
+                        {loadingMore ? "Loading..." : "Load more"}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
@@ -14,7 +14,8 @@ export default function Upload() {
         const selectedFile = e.target.files[0];
         if (selectedFile) {
             setFile(selectedFile);
-            setPreview(URL.createObjectURL(selectedFile));
+            // PDFs are rasterized by the worker; there is no image to preview
+            setPreview(selectedFile.type === "application/pdf" ? null : URL.createObjectURL(selectedFile));
             setError("");
         }
     };
@@ -29,10 +30,22 @@ export default function Upload() {
         setError("");
 
         try {
-            const formData = new FormData();
-            formData.append("file", file);
+            // Send the file straight to storage, then ask the API to queue the job
+            const { data: upload } = await api.post("/api/jobs/uploads", { content_type: file.type });
+            if (file.size > upload.max_bytes) {
+                setError(`Files must be at most ${Math.floor(upload.max_bytes / (1024 * 1024))}MB.`);
+                return;
+            }
+            // The policy fields must precede the file in the form
+            const form = new FormData();
+            Object.entries(upload.fields).forEach(([name, value]) => form.append(name, value));
+            form.append("file", file);
+            const storageRes = await fetch(upload.upload_url, { method: upload.method, body: form });
+            if (!storageRes.ok) {
+                throw new Error(`Storage upload failed with status ${storageRes.status}`);
+            }
 
-            const res = await api.post("/api/jobs", formData);
+            const res = await api.post(`/api/jobs/${upload.job_id}/commit`);
             console.log("Job created:", res.data);
             navigate(`/jobs/${res.data.job_id}`);
         } catch (err) {
@@ -73,24 +86,28 @@ export default function Upload() {
                 <input
                     type="file"
                     ref={fileInputRef}
-                    accept="image/png, image/jpeg"
+                    accept="image/png, image/jpeg, application/pdf"
                     onChange={handleFileChange}
                     style={{ display: 'none' }}
                 />
 
-                {!preview ? (
+                {!file ? (
                     <div>
                         <div style={{ fontSize: '3rem', marginBottom: '1rem' }}>📁</div>
                         <p style={{ fontWeight: '600', marginBottom: '0.5rem' }}>Click to select or drag & drop</p>
-                        <p style={{ fontSize: '0.875rem', color: 'var(--text-muted)' }}>PNG or JPG (max. 10MB)</p>
+                        <p style={{ fontSize: '0.875rem', color: 'var(--text-muted)' }}>PNG, JPG or multi-page PDF (max. 10MB)</p>
                     </div>
                 ) : (
                     <div style={{ position: 'relative' }}>
-                        <img
-                            src={preview}
-                            alt="Preview"
-                            style={{ maxWidth: '100%', maxHeight: '300px', borderRadius: '1rem', boxShadow: '0 10px 25px rgba(0,0,0,0.3)' }}
-                        />
+                        {preview ? (
+                            <img
+                                src={preview}
+                                alt="Preview"
+                                style={{ maxWidth: '100%', maxHeight: '300px', borderRadius: '1rem', boxShadow: '0 10px 25px rgba(0,0,0,0.3)' }}
+                            />
+                        ) : (
+                            <div style={{ fontSize: '3rem' }}>📄</div>
+                        )}
                         <div style={{ marginTop: '1rem', color: 'var(--primary)', fontWeight: '600' }}>
                             {file.name}
                         </div>
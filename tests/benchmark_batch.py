@@ -0,0 +1,87 @@
+import requests
+import uuid
+import time
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Submits the same set of images one POST at a time (as tests/load_test_enqueue.py
+# does) and through POST /api/jobs/batch, as multipart files and as one zip, and
+# compares wall-clock submission time. Each mode uses a fresh user, so one mode's
+# jobs don't count against the next one's rate limit.
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_PASSWORD = "password123"
+NUM_JOBS = int(os.getenv("NUM_JOBS", "100"))
+CONCURRENCY = 10 # Same as load_test_enqueue.py
+
+def get_token():
+    email = f"batch_{uuid.uuid4().hex[:8]}@example.com"
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": email, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+def make_images():
+    # Random pixels, so no single job is answered from the result cache
+    images = []
+    for _ in range(NUM_JOBS):
+        img = Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).resize((640, 640)) # Standard YOLO size
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+def one_at_a_time(token, images):
+    headers = {"Authorization": f"Bearer {token}"}
+    def upload(image):
+        res = requests.post(f"{BASE_URL}/api/jobs", headers=headers, files={"file": ("test.png", image, "image/png")})
+        res.raise_for_status()
+        return res.json()["job_id"]
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        return list(executor.map(upload, images))
+
+def batch_files(token, images):
+    headers = {"Authorization": f"Bearer {token}"}
+    files = [("files", (f"page_{i:03d}.png", image, "image/png")) for i, image in enumerate(images)]
+    res = requests.post(f"{BASE_URL}/api/jobs/batch", headers=headers, files=files)
+    res.raise_for_status()
+    return [job["job_id"] for job in res.json()["jobs"]]
+
+def batch_zip(token, images):
+    headers = {"Authorization": f"Bearer {token}"}
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i, image in enumerate(images):
+            zf.writestr(f"page_{i:03d}.png", image)
+    res = requests.post(f"{BASE_URL}/api/jobs/batch", headers=headers, files={"files": ("drawings.zip", archive.getvalue(), "application/zip")})
+    res.raise_for_status()
+    batch = res.json()
+    status = requests.get(f"{BASE_URL}/api/batches/{batch['batch_id']}", headers=headers).json()
+    print(f"  batch {batch['batch_id']}: {status['counts']}")
+    return [job["job_id"] for job in batch["jobs"]]
+
+def main():
+    images = make_images()
+    modes = {
+        f"one at a time ({CONCURRENCY} threads)": one_at_a_time,
+        "batch (multipart files)": batch_files,
+        "batch (zip)": batch_zip,
+    }
+
+    print(f"Submitting {NUM_JOBS} jobs per mode...")
+    results = {}
+    for mode, submit in modes.items():
+        token = get_token()
+        start = time.time()
+        job_ids = submit(token, images)
+        elapsed = time.time() - start
+        results[mode] = elapsed
+        print(f"{mode:<32}{len(job_ids):>5} jobs in {elapsed:6.2f}s ({len(job_ids) / elapsed:7.1f} jobs/s)")
+
+    baseline = results[next(iter(modes))]
+    for mode, elapsed in list(results.items())[1:]:
+        print(f"{mode}: {baseline / elapsed:.1f}x faster than one at a time")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import requests
+import uuid
+import time
+import io
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_PASSWORD = "password123"
+HEAVY_JOBS = 100 # Backlog submitted by one heavy tenant first
+LIGHT_USERS = 5
+LIGHT_JOBS_PER_USER = 3
+CONCURRENCY = 10 # Number of simultaneous uploads
+POLL_INTERVAL_S = 0.2
+TIMEOUT_S = 900
+
+def create_user():
+    email = f"fairness_{uuid.uuid4().hex[:8]}@example.com"
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": email, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+def unique_image():
+    # Random pixels, so no job is answered from the result cache
+    img = Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).resize((640, 640))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def upload_job(token, priority="normal"):
+    res = requests.post(
+        f"{BASE_URL}/api/jobs",
+        headers={"Authorization": f"Bearer {token}"},
+        params={"priority": priority},
+        files={"file": ("test.png", unique_image(), "image/png")}
+    )
+    res.raise_for_status()
+    return res.json()["job_id"], time.time()
+
+def wait_until_started(token, job_id, queued_at):
+    """Seconds from the create response until a worker picks the job up."""
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.time() - queued_at < TIMEOUT_S:
+        status = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=headers).json()["status"]
+        if status != "queued":
+            return time.time() - queued_at
+        time.sleep(POLL_INTERVAL_S)
+    return None
+
+def report(name, waits):
+    waits = [w for w in waits if w is not None]
+    if not waits:
+        print(f"{name}: no jobs started within {TIMEOUT_S}s")
+        return
+    print(f"{name}: {len(waits)} jobs, queue wait p50 {np.percentile(waits, 50):.1f}s, p95 {np.percentile(waits, 95):.1f}s")
+
+def main():
+    heavy_token = create_user()
+    light_tokens = [create_user() for _ in range(LIGHT_USERS)]
+
+    print(f"Heavy user enqueuing {HEAVY_JOBS} jobs...")
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        heavy_jobs = list(executor.map(lambda _: upload_job(heavy_token), range(HEAVY_JOBS)))
+
+    print(f"{LIGHT_USERS} light users enqueuing {LIGHT_JOBS_PER_USER} jobs each...")
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        futures = [executor.submit(upload_job, token) for token in light_tokens for _ in range(LIGHT_JOBS_PER_USER)]
+        light_jobs = [(light_tokens[i // LIGHT_JOBS_PER_USER],) + f.result() for i, f in enumerate(futures)]
+
+    print("Waiting for jobs to start...")
+    # Sample the heavy backlog rather than polling all of it
+    heavy_sample = heavy_jobs[::10]
+    with ThreadPoolExecutor(max_workers=len(light_jobs) + len(heavy_sample)) as executor:
+        light_futures = [executor.submit(wait_until_started, *job) for job in light_jobs]
+        heavy_futures = [executor.submit(wait_until_started, heavy_token, *job) for job in heavy_sample]
+        light_waits = [f.result() for f in light_futures]
+        heavy_waits = [f.result() for f in heavy_futures]
+
+    report("Light users", light_waits)
+    report("Heavy user (every 10th job)", heavy_waits)
+    print("Queue metrics:", requests.get(f"{BASE_URL}/metrics").json().get("job_queue"))
+
+if __name__ == "__main__":
+    main()
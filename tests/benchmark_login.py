@@ -0,0 +1,79 @@
+import requests
+import uuid
+import time
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_PASSWORD = "password123"
+NUM_LOGIN_CLIENTS = 50 # Clients logging in back to back
+NUM_POLLERS = 50 # Clients polling the job list at the same time
+DURATION_S = 30
+
+def create_user():
+    email = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": email, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return email, res.json()["access_token"]
+
+def login_client(email, stop_at):
+    session = requests.Session()
+    latencies, rejected, errors = [], 0, 0
+    while time.time() < stop_at:
+        start = time.time()
+        try:
+            res = session.post(f"{BASE_URL}/api/auth/login", json={"email": email, "password": TEST_PASSWORD}, timeout=60)
+            if res.status_code == 503:
+                rejected += 1
+                time.sleep(float(res.headers.get("Retry-After", "1")))
+                continue
+            if res.status_code != 200:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append((time.time() - start) * 1000)
+    return latencies, rejected, errors
+
+def poller(token, stop_at):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    latencies, errors = [], 0
+    while time.time() < stop_at:
+        start = time.time()
+        try:
+            if session.get(f"{BASE_URL}/api/jobs", timeout=60).status_code != 200:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append((time.time() - start) * 1000)
+    return latencies, errors
+
+def summarize(name, latencies):
+    if not latencies:
+        print(f"{name}: no completed requests")
+        return
+    print(
+        f"{name}: {len(latencies) / DURATION_S:.1f} req/s, "
+        f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms"
+    )
+
+def main():
+    print(f"Creating {NUM_LOGIN_CLIENTS} test users...")
+    users = [create_user() for _ in range(NUM_LOGIN_CLIENTS)]
+
+    print(f"Running {NUM_LOGIN_CLIENTS} login clients and {NUM_POLLERS} pollers for {DURATION_S}s...")
+    stop_at = time.time() + DURATION_S
+    with ThreadPoolExecutor(max_workers=NUM_LOGIN_CLIENTS + NUM_POLLERS) as executor:
+        logins = [executor.submit(login_client, email, stop_at) for email, _ in users]
+        polls = [executor.submit(poller, users[i % len(users)][1], stop_at) for i in range(NUM_POLLERS)]
+        login_results = [f.result() for f in logins]
+        poll_results = [f.result() for f in polls]
+
+    summarize("Login", [l for lats, _, _ in login_results for l in lats])
+    summarize("Job list", [l for lats, _ in poll_results for l in lats])
+    print(f"Logins rejected with 503: {sum(r for _, r, _ in login_results)}")
+    print(f"Errors: {sum(e for _, _, e in login_results) + sum(e for _, e in poll_results)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import glob
+import io
+import os
+import random
+import sys
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Runs against the worker's code and dependencies, e.g. inside the worker container:
+#   docker compose run --rm -v ./tests:/tests -v ./images:/images worker python /tests/benchmark_overlay.py /images
+WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker")
+sys.path.insert(0, WORKER_DIR if os.path.isdir(WORKER_DIR) else "/worker")
+
+import overlay
+
+REPEATS = 3
+
+def synthetic_detections(image, count):
+    h, w = image.shape[:2]
+    rng = random.Random(0)
+    detections = []
+    for _ in range(count):
+        x, y = rng.uniform(0, w - 60), rng.uniform(0, h - 60)
+        detections.append({"label": "symbol", "confidence": rng.uniform(0.25, 1), "box": [x, y, x + rng.uniform(20, 60), y + rng.uniform(20, 60)]})
+    return detections
+
+def render_pil(image, detections):
+    """The previous renderer: per-box ImageDraw calls and a default-settings PNG."""
+    with Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)) as img:
+        draw = ImageDraw.Draw(img)
+        for item in detections:
+            box = item["box"]
+            draw.rectangle(box, outline="#00ff00", width=3)
+            draw.text((box[0], box[1] - 10 if box[1] > 20 else box[1] + 5), f"{item['label']} {item['confidence']:.2f}", fill="#00ff00")
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return {"overlay": buffer.getvalue()}
+
+def render_cv2(fmt, sizes):
+    def render(image, detections):
+        overlay.draw(image, detections)
+        outputs = {"overlay": overlay.encode(image, fmt)[0]}
+        if sizes:
+            outputs.update(overlay.derivatives(image, sizes))
+        return outputs
+    return render
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlay render + encode time and size per output format")
+    parser.add_argument("images", help="Directory of PNG/JPG drawings")
+    parser.add_argument("--detections", type=int, default=200, help="Synthetic boxes drawn per image")
+    args = parser.parse_args()
+
+    paths = sorted(p for ext in ("png", "jpg", "jpeg") for p in glob.glob(os.path.join(args.images, f"*.{ext}")))
+    if not paths:
+        print(f"No images found in {args.images}")
+        return
+    inputs = [(os.path.getsize(p), cv2.imread(p, cv2.IMREAD_COLOR)) for p in paths]
+    input_bytes = sum(size for size, _ in inputs)
+
+    renderers = {"PIL png (previous)": render_pil}
+    for fmt in overlay.FORMATS:
+        renderers[f"cv2 {fmt}"] = render_cv2(fmt, None)
+    if overlay.OVERLAY_SIZES:
+        renderers[f"cv2 {overlay.OVERLAY_FORMAT} + sizes"] = render_cv2(overlay.OVERLAY_FORMAT, overlay.OVERLAY_SIZES)
+    for name, side in overlay.OVERLAY_SIZES.items():
+        renderers[f"{name} ({side}px) only"] = lambda image, detections, sizes={name: side}: overlay.derivatives(image, sizes)
+
+    print(
+        f"{len(paths)} images ({input_bytes / len(paths) / 1e6:.2f} MB mean input), {args.detections} boxes each, "
+        f"png compression {overlay.OVERLAY_PNG_COMPRESSION}, quality {overlay.OVERLAY_QUALITY}"
+    )
+    print(f"{'renderer':<26}{'ms/image':>10}{'KB/image':>10}{'vs input':>10}")
+    for name, render in renderers.items():
+        seconds, size = 0.0, 0
+        for _, image in inputs:
+            detections = synthetic_detections(image, args.detections)
+            for _ in range(REPEATS):
+                copy = image.copy()
+                start = time.time()
+                outputs = render(copy, detections)
+                seconds += time.time() - start
+            size += sum(len(data) for data in outputs.values())
+        print(f"{name:<26}{seconds / REPEATS / len(paths) * 1000:>10.1f}{size / len(paths) / 1e3:>10.1f}{size / input_bytes:>10.2f}")
+
+if __name__ == "__main__":
+    main()
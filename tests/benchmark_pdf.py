@@ -0,0 +1,61 @@
+import requests
+import uuid
+import time
+import io
+import os
+from PIL import Image
+
+# Submits one page as a PNG, then an NUM_PAGES-page PDF of the same kind of page,
+# and compares the time to completion. Pages of a document run as separate jobs,
+# so with enough workers the PDF should take about as long as its slowest page.
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_PASSWORD = "password123"
+NUM_PAGES = int(os.getenv("NUM_PAGES", "50"))
+TIMEOUT_S = int(os.getenv("TIMEOUT_S", "600"))
+
+def get_token():
+    email = f"pdf_{uuid.uuid4().hex[:8]}@example.com"
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": email, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+def make_page():
+    # Random pixels, so the PNG run isn't answered from the result cache
+    return Image.frombytes("RGB", (160, 120), os.urandom(160 * 120 * 3)).resize((1700, 1100))
+
+def submit(headers, filename, data, content_type):
+    res = requests.post(f"{BASE_URL}/api/jobs", headers=headers, files={"file": (filename, data, content_type)})
+    res.raise_for_status()
+    return res.json()["job_id"]
+
+def wait(headers, job_id, start):
+    while time.time() - start < TIMEOUT_S:
+        status = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=headers).json()["status"]
+        if status in ("succeeded", "failed"):
+            return status, time.time() - start
+        time.sleep(0.5)
+    raise TimeoutError(f"Job {job_id} did not finish within {TIMEOUT_S}s")
+
+def main():
+    headers = {"Authorization": f"Bearer {get_token()}"}
+
+    buffer = io.BytesIO()
+    make_page().save(buffer, format="PNG")
+    start = time.time()
+    status, single = wait(headers, submit(headers, "page.png", buffer.getvalue(), "image/png"), start)
+    print(f"single page (PNG): {status} in {single:.2f}s")
+
+    pages = [make_page() for _ in range(NUM_PAGES)]
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:], resolution=150)
+    start = time.time()
+    job_id = submit(headers, "document.pdf", buffer.getvalue(), "application/pdf")
+    status, elapsed = wait(headers, job_id, start)
+    print(f"{NUM_PAGES}-page PDF: {status} in {elapsed:.2f}s ({elapsed / single:.1f}x one page, {NUM_PAGES}x if run serially)")
+
+    page_statuses = requests.get(f"{BASE_URL}/api/jobs/{job_id}/pages", headers=headers).json()["pages"]
+    failed = [page["page"] for page in page_statuses if page["status"] != "succeeded"]
+    print(f"  {len(page_statuses)} page jobs, failed pages: {failed or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import requests
+import uuid
+import time
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_EMAIL = f"bench_{uuid.uuid4().hex[:8]}@example.com"
+TEST_PASSWORD = "password123"
+CONCURRENCY_LEVELS = [10, 100, 500] # Simultaneous pollers per run
+DURATION_S = 20 # Length of each run
+
+def get_token():
+    print(f"Creating test user: {TEST_EMAIL}")
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": TEST_EMAIL, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+def create_job(token):
+    img_path = "bench_img.png"
+    Image.new('RGB', (640, 640), color='gray').save(img_path)
+    try:
+        with open(img_path, "rb") as f:
+            res = requests.post(
+                f"{BASE_URL}/api/jobs",
+                headers={"Authorization": f"Bearer {token}"},
+                files={"file": ("bench.png", f, "image/png")}
+            )
+        res.raise_for_status()
+        return res.json()["job_id"]
+    finally:
+        os.remove(img_path)
+
+def poller(token, job_id, stop_at):
+    """Mimic an open tab: alternate job-detail and job-list reads until stop_at."""
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    urls = [f"{BASE_URL}/api/jobs/{job_id}", f"{BASE_URL}/api/jobs"]
+    latencies = []
+    errors = 0
+    i = 0
+    while time.time() < stop_at:
+        start = time.time()
+        try:
+            res = session.get(urls[i % 2], timeout=30)
+            if res.status_code != 200:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+        latencies.append((time.time() - start) * 1000)
+        i += 1
+    return latencies, errors
+
+def run(token, job_id, concurrency):
+    stop_at = time.time() + DURATION_S
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(poller, token, job_id, stop_at) for _ in range(concurrency)]
+        results = [f.result() for f in futures]
+
+    latencies = [l for lats, _ in results for l in lats]
+    errors = sum(e for _, e in results)
+    print(
+        f"{concurrency:>6} pollers: {len(latencies) / DURATION_S:>8.1f} req/s  "
+        f"p50 {np.percentile(latencies, 50):>8.1f} ms  p95 {np.percentile(latencies, 95):>8.1f} ms  "
+        f"errors {errors}"
+    )
+
+def main():
+    token = get_token()
+    job_id = create_job(token)
+
+    print(f"Polling for {DURATION_S}s at each concurrency level against {BASE_URL}")
+    for concurrency in CONCURRENCY_LEVELS:
+        run(token, job_id, concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import cv2
+
+# Runs against the worker's code and dependencies, e.g. inside the worker container:
+#   docker compose run --rm -v ./tests:/tests -v ./drawings:/drawings worker python /tests/benchmark_tiling.py /drawings
+WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker")
+sys.path.insert(0, WORKER_DIR if os.path.isdir(WORKER_DIR) else "/worker")
+
+import tiling
+from yolo import YoloModel
+
+MODEL_NAME = os.getenv("MODEL_NAME", "yolov8n.pt")
+MATCH_IOU = 0.5
+
+def iou(a, b):
+    ix1, iy1, ix2, iy2 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0
+
+def matched(reference, candidate):
+    """Reference boxes found by a same-label candidate box at MATCH_IOU (greedy)."""
+    used = set()
+    found = 0
+    for ref in reference:
+        for i, det in enumerate(candidate):
+            if i not in used and det["label"] == ref["label"] and iou(ref["box"], det["box"]) >= MATCH_IOU:
+                used.add(i)
+                found += 1
+                break
+    return found
+
+def load_labels(path, image, names):
+    """YOLO-format ground truth (class cx cy w h, normalised) -> detections in pixels; None if absent."""
+    if not os.path.exists(path):
+        return None
+    h, w = image.shape[:2]
+    labels = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            cls, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:])
+            labels.append({"label": names[cls], "box": [(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h]})
+    return labels
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and recall of tiled vs full-image inference")
+    parser.add_argument("images", help="Directory of drawings (PNG/JPG); YOLO .txt labels with the same name are used as ground truth")
+    parser.add_argument("--labels", help="Directory holding the .txt labels, if not next to the images")
+    parser.add_argument("--tile-size", type=int, default=tiling.TILE_SIZE)
+    parser.add_argument("--overlap", type=int, default=tiling.TILE_OVERLAP)
+    parser.add_argument("--batch", type=int, default=tiling.TILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    paths = sorted(p for ext in ("png", "jpg", "jpeg") for p in glob.glob(os.path.join(args.images, f"*.{ext}")))
+    if not paths:
+        print(f"No images found in {args.images}")
+        return
+
+    model = YoloModel(MODEL_NAME)
+    names = model.model.names
+    model.predict(cv2.imread(paths[0], cv2.IMREAD_COLOR)) # Warm-up
+
+    modes = {
+        "full image": lambda image: model.predict(image),
+        f"tiled {args.tile_size}px/{args.overlap}px": lambda image: tiling.predict_tiled(model, image, args.tile_size, args.overlap, args.batch),
+    }
+    totals = {mode: {"seconds": 0.0, "detections": 0, "found": 0, "vs_full": 0} for mode in modes}
+    truth_total = full_total = 0
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        truth = load_labels(os.path.join(args.labels or args.images, f"{stem}.txt"), image, names)
+
+        outputs = {}
+        for mode, predict in modes.items():
+            start = time.time()
+            outputs[mode] = predict(image)
+            totals[mode]["seconds"] += time.time() - start
+            totals[mode]["detections"] += len(outputs[mode])
+            if truth is not None:
+                totals[mode]["found"] += matched(truth, outputs[mode])
+
+        full = outputs["full image"]
+        full_total += len(full)
+        for mode in modes:
+            totals[mode]["vs_full"] += matched(full, outputs[mode])
+        if truth is not None:
+            truth_total += len(truth)
+
+    print(f"{len(paths)} images, tile batch {args.batch}")
+    print(f"{'mode':<24}{'images/s':>10}{'s/image':>10}{'detections':>12}{'recall':>9}{'full found':>12}")
+    for mode, t in totals.items():
+        recall = f"{t['found'] / truth_total:.3f}" if truth_total else "n/a"
+        vs_full = f"{t['vs_full'] / full_total:.3f}" if full_total else "n/a"
+        print(f"{mode:<24}{len(paths) / t['seconds']:>10.2f}{t['seconds'] / len(paths):>10.2f}{t['detections']:>12}{recall:>9}{vs_full:>12}")
+
+if __name__ == "__main__":
+    main()
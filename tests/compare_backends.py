@@ -0,0 +1,115 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# Runs against the worker's code and dependencies, e.g. inside the worker container:
+#   docker compose run --rm -v ./tests:/tests -v ./images:/images worker python /tests/compare_backends.py /images
+WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "worker")
+sys.path.insert(0, WORKER_DIR if os.path.isdir(WORKER_DIR) else "/worker")
+
+from yolo import YoloModel
+from onnx_yolo import OnnxYoloModel
+
+MODEL_NAME = os.getenv("MODEL_NAME", "yolov8n.pt")
+BACKENDS = [
+    ("torch", "fp32"),
+    ("onnxruntime", "fp32"),
+    ("onnxruntime", "int8"),
+    ("openvino", "fp32"),
+    ("openvino", "int8"),
+]
+WARMUP_RUNS = 2
+REPEATS = 3
+MATCH_IOU = 0.5
+
+def load(backend, precision):
+    if backend == "torch":
+        return YoloModel(MODEL_NAME)
+    return OnnxYoloModel(MODEL_NAME, runtime=backend, quantize=precision == "int8")
+
+def iou(a, b):
+    ix1, iy1, ix2, iy2 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0
+
+def match(reference, candidate):
+    """Greedy same-label matching at MATCH_IOU; returns (matched count, IoUs, confidence deltas)."""
+    used = set()
+    ious, deltas = [], []
+    for ref in sorted(reference, key=lambda d: -d["confidence"]):
+        best, best_iou = None, MATCH_IOU
+        for i, det in enumerate(candidate):
+            if i in used or det["label"] != ref["label"]:
+                continue
+            overlap = iou(ref["box"], det["box"])
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        if best is not None:
+            used.add(best)
+            ious.append(best_iou)
+            deltas.append(abs(candidate[best]["confidence"] - ref["confidence"]))
+    return len(used), ious, deltas
+
+def run(model, images):
+    for _ in range(WARMUP_RUNS):
+        model.predict(images[0])
+    latencies, outputs = [], []
+    for image in images:
+        for _ in range(REPEATS):
+            start = time.time()
+            detections = model.predict(image)
+            latencies.append((time.time() - start) * 1000)
+        outputs.append(detections)
+    return latencies, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends against the .pt model on a fixed image set")
+    parser.add_argument("images", help="Directory of PNG/JPG images")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    paths = sorted(p for ext in ("png", "jpg", "jpeg") for p in glob.glob(os.path.join(args.images, f"*.{ext}")))
+    if not paths:
+        print(f"No images found in {args.images}")
+        return
+    images = [cv2.imread(p, cv2.IMREAD_COLOR) for p in paths]
+    print(f"{len(images)} images, {args.threads} threads, {REPEATS} timed runs per image")
+
+    reference = None
+    print(f"{'backend':<22}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'recall':>9}{'precision':>11}{'mean IoU':>10}{'mean dconf':>12}")
+    for backend, precision in BACKENDS:
+        try:
+            model = load(backend, precision)
+            model.set_threads(args.threads)
+            latencies, outputs = run(model, images)
+        except ImportError as e:
+            print(f"{backend + ' ' + precision:<22}skipped ({e})")
+            continue
+
+        if reference is None:
+            # The first backend (torch .pt) is the accuracy reference
+            reference = outputs
+        matched = ref_total = cand_total = 0
+        ious, deltas = [], []
+        for ref, cand in zip(reference, outputs):
+            m, i, d = match(ref, cand)
+            matched += m
+            ref_total += len(ref)
+            cand_total += len(cand)
+            ious += i
+            deltas += d
+
+        print(
+            f"{backend + ' ' + precision:<22}"
+            f"{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 95):>9.1f}{np.mean(latencies):>9.1f}"
+            f"{matched / ref_total if ref_total else 1:>9.3f}{matched / cand_total if cand_total else 1:>11.3f}"
+            f"{np.mean(ious) if ious else 0:>10.3f}{np.mean(deltas) if deltas else 0:>12.4f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import requests
+import subprocess
+import uuid
+import time
+import io
+import os
+from PIL import Image
+
+# Restarts the worker container, then measures how long until a worker reports
+# ready and how long the first and a following job take end to end.
+BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
+TEST_EMAIL = f"coldstart_{uuid.uuid4().hex[:8]}@example.com"
+TEST_PASSWORD = "password123"
+FOLLOWUP_JOBS = 5
+TIMEOUT_S = 300
+
+def get_token():
+    res = requests.post(f"{BASE_URL}/api/auth/signup", json={"email": TEST_EMAIL, "password": TEST_PASSWORD})
+    res.raise_for_status()
+    return res.json()["access_token"]
+
+def unique_image():
+    # Random pixels, so no job is answered from the result cache
+    img = Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).resize((640, 640))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def run_job(token):
+    """Submit a job and wait for it to finish; returns seconds from submission to a final status."""
+    headers = {"Authorization": f"Bearer {token}"}
+    start = time.time()
+    res = requests.post(f"{BASE_URL}/api/jobs", headers=headers, files={"file": ("test.png", unique_image(), "image/png")})
+    res.raise_for_status()
+    job_id = res.json()["job_id"]
+    while time.time() - start < TIMEOUT_S:
+        status = requests.get(f"{BASE_URL}/api/jobs/{job_id}", headers=headers).json()["status"]
+        if status in ("succeeded", "failed"):
+            return time.time() - start, status
+        time.sleep(0.1)
+    return None, "timeout"
+
+def ready_workers():
+    try:
+        return requests.get(f"{BASE_URL}/metrics").json().get("job_queue", {}).get("ready_workers")
+    except requests.RequestException:
+        return None
+
+def main():
+    token = get_token()
+
+    print("Restarting worker...")
+    subprocess.run(["docker", "compose", "restart", "worker"], check=True)
+    restarted_at = time.time()
+
+    # Queue the first job straight away, as a user would after a deploy
+    first_latency, first_status = run_job(token)
+
+    ready = ready_workers()
+    print(f"First job after restart: {first_latency:.2f}s ({first_status})" if first_latency else f"First job: {first_status}")
+    print(f"Ready workers reported by /metrics: {ready if ready is not None else 'n/a (not supported by this build)'}")
+
+    latencies = []
+    for _ in range(FOLLOWUP_JOBS):
+        latency, _ = run_job(token)
+        if latency:
+            latencies.append(latency)
+    if latencies:
+        print(f"Following {len(latencies)} jobs: mean {sum(latencies) / len(latencies):.2f}s, max {max(latencies):.2f}s")
+
+    print("Worker startup log lines:")
+    logs = subprocess.run(
+        ["docker", "compose", "logs", "--since", f"{int(time.time() - restarted_at) + 5}s", "worker"],
+        capture_output=True, text=True
+    ).stdout
+    for line in logs.splitlines():
+        if "after launch" in line or "Warm-up finished" in line:
+            print("  " + line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import fakeredis
+import pytest
+from app.admission import TOKEN_BUCKET_LUA
+
+# fakeredis runs the Lua script itself (through lupa)
+@pytest.fixture
+def take():
+    script = fakeredis.FakeRedis().register_script(TOKEN_BUCKET_LUA)
+    # 3-token bucket refilling at one token per second
+    return lambda now, cost=1: script(keys=["rate_limit:jobs:user"], args=[now, 1, 3, cost])
+
+def test_burst_then_refusal_with_wait(take):
+    assert [take(100) for _ in range(3)] == [[1, 0]] * 3
+    assert take(100) == [0, 1000]
+
+def test_refills_over_time_up_to_capacity(take):
+    for _ in range(3):
+        take(100)
+    assert take(101.5) == [1, 0]
+    assert take(101.5) == [0, 500]
+    # An hour idle refills only to capacity
+    assert take(4000, cost=3) == [1, 0]
+    assert take(4000) == [0, 1000]
+
+def test_refund_gives_tokens_back_up_to_capacity(take):
+    assert take(100, cost=3) == [1, 0]
+    assert take(100, cost=-2) == [1, 0]
+    assert take(100, cost=2) == [1, 0]
+    assert take(100) == [0, 1000]
+    # Refunding more than was taken never grows the bucket past capacity
+    take(100, cost=-10)
+    assert take(100, cost=3) == [1, 0]
+    assert take(100) == [0, 1000]
+
+def test_batch_cost_is_taken_at_once(take):
+    assert take(100, cost=2) == [1, 0]
+    assert take(100, cost=2) == [0, 1000]
+    assert take(100, cost=1) == [1, 0]
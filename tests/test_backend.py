@@ -2,11 +2,23 @@ import requests
 import time
 import os
 import uuid
+import io
+from PIL import Image
 
 BASE_URL = "http://localhost:8000"
 TEST_EMAIL = f"test_{uuid.uuid4().hex[:8]}@example.com"
 TEST_PASSWORD = "testpassword123"
 
+def wait_for_status(url, headers, finished, retries=30):
+    """Poll url until its status is one of finished; returns the last response body."""
+    for _ in range(retries):
+        body = requests.get(url, headers=headers).json()
+        print(f"Current status: {body['status']}")
+        if body["status"] in finished:
+            return body
+        time.sleep(2)
+    raise AssertionError(f"{url} still {body['status']} after {retries} polls")
+
 def test_backend_happy_path():
     # 1. Signup
     print(f"Signing up with {TEST_EMAIL}...")
@@ -65,6 +77,70 @@ def test_backend_happy_path():
     assert csv_res.status_code == 200
     assert "text/csv" in csv_res.headers["content-type"]
 
+    print("Verifying conditional and range downloads...")
+    etag = csv_res.headers["etag"]
+    assert requests.get(f"{BASE_URL}/api/jobs/{job_id}/csv", headers={**headers, "If-None-Match": etag}).status_code == 304
+    range_res = requests.get(f"{BASE_URL}/api/jobs/{job_id}/csv", headers={**headers, "Range": "bytes=0-4"})
+    assert range_res.status_code == 206
+    assert range_res.content == csv_res.content[:5]
+    assert range_res.headers["content-range"] == f"bytes 0-4/{len(csv_res.content)}"
+
+    print("Verifying detections query...")
+    detections_res = requests.get(f"{BASE_URL}/api/jobs/{job_id}/detections", headers=headers)
+    assert detections_res.status_code == 200
+    detections = detections_res.json()["items"]
+    assert len(detections) == len(csv_res.text.strip().splitlines()) - 1
+
+    summary_res = requests.get(f"{BASE_URL}/api/detections/summary", params={"last_jobs": 1}, headers=headers)
+    assert summary_res.status_code == 200
+    assert summary_res.json()["detections"] == len(detections)
+
+    # 5. Job listing pages by cursor
+    print("Verifying job list pagination...")
+    for _ in range(2):
+        with open(img_path, "rb") as f:
+            res = requests.post(f"{BASE_URL}/api/jobs", headers=headers, files={"file": ("test_image.png", f, "image/png")})
+        assert res.status_code == 200, f"Upload failed: {res.text}"
+    first_page = requests.get(f"{BASE_URL}/api/jobs", params={"limit": 2}, headers=headers).json()
+    assert len(first_page["items"]) == 2 and first_page["next_cursor"]
+    second_page = requests.get(f"{BASE_URL}/api/jobs", params={"limit": 2, "cursor": first_page["next_cursor"]}, headers=headers).json()
+    assert len(second_page["items"]) == 1 and second_page["next_cursor"] is None
+    assert second_page["items"][0]["id"] == job_id
+    assert requests.get(f"{BASE_URL}/api/jobs", params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+    # 6. Batch submission
+    print("Verifying batch submission...")
+    files = []
+    for i, color in enumerate(["blue", "green"]):
+        buffer = io.BytesIO()
+        Image.new('RGB', (100, 100), color=color).save(buffer, format="PNG")
+        files.append(("files", (f"batch_{i}.png", buffer.getvalue(), "image/png")))
+    batch_res = requests.post(f"{BASE_URL}/api/jobs/batch", headers=headers, files=files)
+    assert batch_res.status_code == 200, f"Batch failed: {batch_res.text}"
+    batch = batch_res.json()
+    assert batch["count"] == 2 and [job["filename"] for job in batch["jobs"]] == ["batch_0.png", "batch_1.png"]
+    batch_status = wait_for_status(f"{BASE_URL}/api/batches/{batch['batch_id']}", headers, ["completed"])
+    assert batch_status["total"] == 2 and batch_status["counts"] == {"succeeded": 2}
+
+    # 7. Multi-page PDF fans out into page jobs
+    print("Verifying PDF page fan-out...")
+    pages = [Image.new('RGB', (850, 1100), color=color) for color in ["white", "yellow"]]
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:])
+    pdf_res = requests.post(f"{BASE_URL}/api/jobs", headers=headers, files={"file": ("drawing.pdf", buffer.getvalue(), "application/pdf")})
+    assert pdf_res.status_code == 200, f"PDF upload failed: {pdf_res.text}"
+    document_id = pdf_res.json()["job_id"]
+    document = wait_for_status(f"{BASE_URL}/api/jobs/{document_id}", headers, ["succeeded", "failed"])
+    assert document["status"] == "succeeded"
+    page_jobs = requests.get(f"{BASE_URL}/api/jobs/{document_id}/pages", headers=headers).json()["pages"]
+    assert [(page["page"], page["status"]) for page in page_jobs] == [(1, "succeeded"), (2, "succeeded")]
+    document_csv = requests.get(f"{BASE_URL}/api/jobs/{document_id}/csv", headers=headers)
+    assert document_csv.status_code == 200 and document_csv.text.startswith("Page,")
+    assert requests.get(f"{BASE_URL}/api/jobs/{document_id}/detections", params={"page": 2}, headers=headers).status_code == 200
+    # Page jobs are only listed under their document
+    listed = [job["id"] for job in requests.get(f"{BASE_URL}/api/jobs", params={"limit": 100}, headers=headers).json()["items"]]
+    assert document_id in listed and not {page["job_id"] for page in page_jobs} & set(listed)
+
     # Cleanup
     if os.path.exists(img_path):
         os.remove(img_path)
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import fakeredis.aioredis
+from app import events
+
+
+class Request:
+    async def is_disconnected(self):
+        return False
+
+
+async def next_event(stream):
+    while True:
+        chunk = await asyncio.wait_for(stream.__anext__(), 5)
+        if chunk.startswith("event:"):
+            return json.loads(chunk.split("data: ", 1)[1])
+
+
+def test_streams_share_one_subscription():
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        events._subscriber = None
+        tabs = [events.stream(Request(), redis, "alice") for _ in range(3)]
+        other = events.stream(Request(), redis, "bob")
+        for stream in tabs + [other]:
+            assert await stream.__anext__() == "retry: 3000\n\n"
+
+        assert await redis.pubsub_numsub(events.channel("alice")) == [(b"job_events:alice", 1)]
+        await events.publish(redis, "alice", "job-1", "succeeded")
+        assert [await next_event(stream) for stream in tabs] == [{"job_id": "job-1", "status": "succeeded"}] * 3
+
+        # The channel is released once its last stream closes
+        for stream in tabs:
+            await stream.aclose()
+        assert await redis.pubsub_numsub(events.channel("alice")) == [(b"job_events:alice", 0)]
+        await events.publish(redis, "bob", "job-2", "queued")
+        assert await next_event(other) == {"job_id": "job-2", "status": "queued"}
+        await other.aclose()
+
+    asyncio.run(scenario())
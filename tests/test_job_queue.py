@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "worker"))
+
+import fakeredis
+import pytest
+import job_queue
+from job_queue import ReliableQueue
+
+# fakeredis runs the claim/ack/recover Lua scripts itself (through lupa)
+@pytest.fixture
+def r():
+    return fakeredis.FakeRedis()
+
+def enqueue(queue, user_id, job_id, priority="normal"):
+    message = json.dumps({"job_id": job_id, "user_id": user_id, "priority": priority}).encode("utf-8")
+    queue.enqueue_many([(user_id, priority, message)])
+    return message
+
+def job_ids(queue, count):
+    return [json.loads(queue.try_claim()[0])["job_id"] for _ in range(count)]
+
+def test_users_take_turns(r):
+    queue = ReliableQueue(r, consumer="w1")
+    for job_id in ("a1", "a2", "a3"):
+        enqueue(queue, "alice", job_id)
+    enqueue(queue, "bob", "b1")
+    assert job_ids(queue, 4) == ["a1", "b1", "a2", "a3"]
+    assert queue.try_claim() is None
+    assert int(r.hget(job_queue.DEPTH_KEY, "normal")) == 0
+
+def test_high_priority_is_tried_first(r):
+    queue = ReliableQueue(r, consumer="w1")
+    enqueue(queue, "alice", "low", priority="low")
+    enqueue(queue, "alice", "high", priority="high")
+    assert job_ids(queue, 2) == ["high", "low"]
+
+def test_per_user_cap_skips_busy_users(r, monkeypatch):
+    monkeypatch.setattr(job_queue, "MAX_INFLIGHT_PER_USER", 1)
+    queue = ReliableQueue(r, consumer="w1")
+    first = enqueue(queue, "alice", "a1")
+    enqueue(queue, "alice", "a2")
+    enqueue(queue, "bob", "b1")
+    assert job_ids(queue, 2) == ["a1", "b1"]
+    assert queue.try_claim() is None
+    # The ack frees alice's slot
+    queue.ack(first, "alice")
+    assert job_ids(queue, 1) == ["a2"]
+
+def test_claim_names_the_user_of_an_unreadable_message(r, monkeypatch):
+    monkeypatch.setattr(job_queue, "MAX_INFLIGHT_PER_USER", 1)
+    queue = ReliableQueue(r, consumer="w1")
+    queue.enqueue_many([("alice", "normal", b"not json")])
+    enqueue(queue, "alice", "a1")
+    message, user_id = queue.try_claim()
+    assert (message, user_id) == (b"not json", "alice")
+    queue.ack(message, user_id)
+    assert job_ids(queue, 1) == ["a1"]
+
+def test_ack_clears_lease_and_processing(r):
+    queue = ReliableQueue(r, consumer="w1")
+    message = enqueue(queue, "alice", "a1")
+    assert queue.try_claim() == (message, "alice")
+    assert r.llen(queue.processing_key) == 1
+    queue.ack(message, "alice")
+    queue.ack(message, "alice")
+    assert r.llen(queue.processing_key) == 0
+    assert r.zcard(job_queue.LEASES_KEY) == 0
+    assert int(r.hget(job_queue.INFLIGHT_KEY, "alice")) == 0
+    assert queue.recover() == []
+
+def test_expired_lease_is_redelivered_then_dead_lettered(r, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_VISIBILITY_TIMEOUT_S", -1)
+    monkeypatch.setattr(job_queue, "MAX_ATTEMPTS", 2)
+    queue = ReliableQueue(r, consumer="w1")
+    enqueue(queue, "alice", "a1")
+    queue.try_claim()
+    assert queue.recover() == []
+    redelivered = json.loads(queue.try_claim()[0])
+    assert redelivered == {"job_id": "a1", "user_id": "alice", "priority": "normal", "attempts": 1}
+    dead = queue.recover()
+    assert [json.loads(message)["attempts"] for message in dead] == [2]
+    assert r.llen(job_queue.DEAD_LETTER_KEY) == 1
+    assert queue.try_claim() is None
+
+def test_heartbeat_renews_leases_of_held_jobs(r, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_VISIBILITY_TIMEOUT_S", -1)
+    queue = ReliableQueue(r, consumer="w1")
+    message = enqueue(queue, "alice", "a1")
+    queue.try_claim()
+    monkeypatch.setattr(job_queue, "JOB_VISIBILITY_TIMEOUT_S", 300)
+    queue.heartbeat()
+    assert queue.recover() == []
+    assert r.llen(queue.processing_key) == 1
+    # An acked job's lease is not recreated
+    queue.ack(message, "alice")
+    queue.heartbeat()
+    assert r.zcard(job_queue.LEASES_KEY) == 0
+
+def test_dead_worker_jobs_go_back_to_the_front(r):
+    dead_worker = ReliableQueue(r, consumer="w1")
+    dead_worker.heartbeat()
+    enqueue(dead_worker, "alice", "a1")
+    enqueue(dead_worker, "alice", "a2")
+    dead_worker.try_claim()
+    r.delete(f"{job_queue.HEARTBEAT_PREFIX}:w1")
+
+    queue = ReliableQueue(r, consumer="w2")
+    assert queue.recover() == []
+    assert r.zcard(job_queue.LEASES_KEY) == 0
+    assert not r.sismember(job_queue.CONSUMERS_KEY, "w1")
+    assert job_ids(queue, 2) == ["a1", "a2"]
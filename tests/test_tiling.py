@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "worker"))
+
+import tiling
+
+SIZE = (1152, 640)
+LEFT = (0, 0, 640, 640)
+RIGHT = (512, 0, 1152, 640)
+
+def detection(label, confidence, box):
+    return {"label": label, "confidence": confidence, "box": box}
+
+def test_merge_keeps_small_symbols_inside_a_coarse_box():
+    coarse = detection("valve", 0.6, [0, 0, 400, 300])
+    valves = [detection("valve", 0.8, [x, 50, x + 30, 80]) for x in (20, 100, 180, 260)]
+    merged = tiling.merge([coarse] + valves, [None] + [LEFT] * 4, SIZE)
+    assert sorted(d["box"] for d in merged) == sorted(d["box"] for d in [coarse] + valves)
+
+def test_merge_removes_duplicates_from_overlapping_tiles():
+    merged = tiling.merge(
+        [detection("valve", 0.7, [550, 100, 590, 140]), detection("valve", 0.9, [551, 101, 590, 140])],
+        [LEFT, RIGHT], SIZE
+    )
+    assert merged == [detection("valve", 0.9, [551, 101, 590, 140])]
+
+def test_merge_drops_fragment_cut_at_seam_without_growing_boxes():
+    complete = detection("valve", 0.8, [600, 100, 680, 140])
+    fragment = detection("valve", 0.9, [600, 100, 640, 140])
+    merged = tiling.merge([fragment, complete], [LEFT, RIGHT], SIZE)
+    assert merged == [complete]
+
+def test_merge_keeps_overlapping_boxes_of_different_classes():
+    merged = tiling.merge(
+        [detection("valve", 0.9, [100, 100, 140, 140]), detection("pump", 0.8, [100, 100, 140, 140])],
+        [LEFT, LEFT], SIZE
+    )
+    assert len(merged) == 2
@@ -0,0 +1,48 @@
+import csv
+import io
+
+# Detections go into one COPY per job rather than row-by-row INSERTs. The table is
+# created by the backend (app.models.Detection).
+COPY_SQL = "COPY detections (job_id, user_id, label, confidence, x1, y1, x2, y2) FROM STDIN WITH (FORMAT csv)"
+
+
+def store(engine, job_id, user_id, detections):
+    """Replace a job's detections in one transaction, so redelivered jobs don't duplicate rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for d in detections:
+        writer.writerow([job_id, user_id, d["label"], d["confidence"], *d["box"]])
+    buffer.seek(0)
+
+    # COPY needs the driver's cursor (psycopg2 copy_expert)
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM detections WHERE job_id = %s", (job_id,))
+            if detections:
+                cursor.copy_expert(COPY_SQL, buffer)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def copy(engine, source_id, job_id, user_id):
+    """Copy one job's detections onto another (result cache hits) with a single INSERT ... SELECT."""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM detections WHERE job_id = %s", (job_id,))
+            cursor.execute(
+                "INSERT INTO detections (job_id, user_id, label, confidence, x1, y1, x2, y2) "
+                "SELECT %s, %s, label, confidence, x1, y1, x2, y2 FROM detections WHERE job_id = %s ORDER BY id",
+                (job_id, user_id, source_id)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
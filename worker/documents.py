@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import pypdfium2 as pdfium
+from minio.commonconfig import CopySource
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from job_queue import DEFAULT_PRIORITY
+
+# Multi-page PDFs are stored once by the backend. The document's own job only counts
+# the pages and fans out one sub-job per page; whichever worker takes a page rasterizes
+# just that page, at PDF_DPI. The last page to finish recombines the results.
+PDF_DPI = int(os.getenv("PDF_DPI", "150"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+# Downloaded PDFs kept per process, so consecutive pages of a document aren't refetched
+PDF_CACHE_SIZE = max(1, int(os.getenv("PDF_CACHE_SIZE", "4")))
+
+# job_queue:pages:{document id}:total / :done (set of finished pages) / :combined
+PAGES_PREFIX = "job_queue:pages"
+PAGES_TTL_S = 7 * 24 * 3600
+
+# KEYS: done set, total, combined flag. ARGV: page, ttl.
+# A set rather than a counter, so a redelivered page is never counted twice. Returns 1
+# exactly once per document: to the call that records its last outstanding page.
+PAGE_DONE_LUA = """
+redis.call('SADD', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local total = tonumber(redis.call('GET', KEYS[2]))
+if total and redis.call('SCARD', KEYS[1]) >= total and redis.call('SET', KEYS[3], 1, 'NX', 'EX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_page_done_script = None
+
+
+def page_job_id(document_id, page):
+    """Deterministic, so splitting a redelivered document creates no duplicate pages."""
+    return str(uuid.uuid5(uuid.UUID(document_id), str(page)))
+
+
+def fetch(minio_client, bucket, path):
+    with _cache_lock:
+        if path in _cache:
+            _cache.move_to_end(path)
+            return _cache[path]
+    response = minio_client.get_object(bucket, path)
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    with _cache_lock:
+        _cache[path] = data
+        while len(_cache) > PDF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data
+
+
+def page_count(data):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def render_page(data, page, dpi=PDF_DPI):
+    """Rasterize one (1-based) page into the BGR array the model and overlay renderer share."""
+    pdf = pdfium.PdfDocument(data)
+    try:
+        bitmap = pdf[page - 1].render(scale=dpi / 72)
+        # The array is a view of pdfium's buffer, which is freed with the document
+        return bitmap.to_numpy().copy()
+    finally:
+        pdf.close()
+
+
+def split(engine, jobs, r, payload, pages):
+    """Create the page sub-jobs and the completion tracking; returns their queue payloads.
+
+    Splitting a redelivered document again is harmless: the page rows already exist, and
+    a page queued twice just stores the same detections again and is counted once.
+    """
+    document_id = payload["job_id"]
+    page_ids = [page_job_id(document_id, page) for page in range(1, pages + 1)]
+    with engine.begin() as conn:
+        model = conn.execute(
+            text("SELECT model_name, model_version FROM jobs WHERE id = :id"), {"id": document_id}
+        ).one()
+        conn.execute(
+            insert(jobs).values([
+                {
+                    "id": uuid.UUID(page_id),
+                    "user_id": uuid.UUID(payload["user_id"]),
+                    "parent_id": uuid.UUID(document_id),
+                    "page": page,
+                    "status": "queued",
+                    "model_name": model.model_name,
+                    "model_version": model.model_version,
+                }
+                for page, page_id in enumerate(page_ids, start=1)
+            ]).on_conflict_do_nothing(index_elements=["id"])
+        )
+    r.set(f"{PAGES_PREFIX}:{document_id}:total", pages, ex=PAGES_TTL_S)
+
+    dpi = payload.get("dpi", PDF_DPI)
+    enqueued_at = time.time()
+    return [
+        {
+            "job_id": page_id,
+            "user_id": payload["user_id"],
+            "bucket": payload["bucket"],
+            "path": payload["path"],
+            "priority": payload.get("priority", DEFAULT_PRIORITY),
+            "enqueued_at": enqueued_at,
+            "parent_id": document_id,
+            "page": page,
+            "dpi": dpi,
+        }
+        for page, page_id in enumerate(page_ids, start=1)
+    ]
+
+
+def page_done(r, payload):
+    """Record a page as finished (succeeded or failed); True for the document's last page."""
+    global _page_done_script
+    if _page_done_script is None:
+        _page_done_script = r.register_script(PAGE_DONE_LUA)
+    key = f"{PAGES_PREFIX}:{payload['parent_id']}"
+    return bool(_page_done_script(
+        keys=[f"{key}:done", f"{key}:total", f"{key}:combined"],
+        args=[payload["page"], PAGES_TTL_S],
+    ))
+
+
+def combine(engine, minio_client, payload):
+    """Per-document results from its pages: a results.csv with a Page column, the first
+    succeeded page's overlay images, and a summary result."""
+    document_id = payload["parent_id"]
+    bucket = payload["bucket"]
+    user_id = payload["user_id"]
+    with engine.connect() as conn:
+        pages = conn.execute(
+            text("SELECT id, page, status, result FROM jobs WHERE parent_id = :id ORDER BY page"), {"id": document_id}
+        ).all()
+        rows = conn.execute(
+            text(
+                "SELECT j.page, d.label, d.confidence, d.x1, d.y1, d.x2, d.y2 FROM detections d "
+                "JOIN jobs j ON j.id = d.job_id WHERE j.parent_id = :id ORDER BY j.page, d.id"
+            ),
+            {"id": document_id}
+        ).all()
+
+    csv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer)
+    csv_writer.writerow(["Page", "Label", "Confidence", "X1", "Y1", "X2", "Y2"])
+    for row in rows:
+        csv_writer.writerow([row.page, row.label, f"{row.confidence:.2f}", int(row.x1), int(row.y1), int(row.x2), int(row.y2)])
+    csv_content = csv_buffer.getvalue().encode("utf-8")
+    minio_client.put_object(
+        bucket, f"{user_id}/{document_id}/results.csv", io.BytesIO(csv_content), length=len(csv_content), content_type="text/csv"
+    )
+
+    artifacts = {"csv": "results.csv"}
+    succeeded = [page for page in pages if page.status == "succeeded"]
+    if succeeded:
+        first = json.loads(succeeded[0].result or "{}").get("artifacts", {})
+        # The document is shown by its first page; names keep the page's format
+        for artifact, name in first.items():
+            if artifact == "csv":
+                continue
+            minio_client.copy_object(
+                bucket, f"{user_id}/{document_id}/{name}", CopySource(bucket, f"{user_id}/{succeeded[0].id}/{name}")
+            )
+            artifacts[artifact] = name
+
+    return {
+        "pages": len(pages),
+        "failed_pages": [page.page for page in pages if page.status != "succeeded"],
+        "detected": sorted({row.label for row in rows}),
+        "count": len(rows),
+        "artifacts": artifacts,
+    }
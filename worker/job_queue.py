@@ -0,0 +1,292 @@
+import itertools
+import os
+import socket
+import time
+
+# The backend queues each job on its user's sub-queue for the job's priority class,
+# job_queue:{class}:user:{user_id}, and adds the user to job_queue:{class}:ring if
+# the sub-queue was empty (backend/app/job_queue.py). Workers take one job per user
+# in turn from the ring, atomically moving it into their own processing list and
+# recording a lease; the message is only removed (acked) once the job reaches a
+# final status. Each heartbeat renews the leases of the worker's jobs, so a slow job
+# on a live worker is not redelivered. Messages held by a worker that stops
+# heartbeating, or whose lease runs out, are put back at the front of their user's
+# sub-queue.
+KEY_PREFIX = "job_queue"
+DEPTH_KEY = f"{KEY_PREFIX}:depth"
+SIGNAL_KEY = f"{KEY_PREFIX}:signal"
+INFLIGHT_KEY = f"{KEY_PREFIX}:inflight"
+PROCESSING_PREFIX = f"{KEY_PREFIX}:processing"
+LEASES_KEY = f"{KEY_PREFIX}:leases"
+CONSUMERS_KEY = f"{KEY_PREFIX}:consumers"
+HEARTBEAT_PREFIX = f"{KEY_PREFIX}:heartbeat"
+DEAD_LETTER_KEY = f"{KEY_PREFIX}:dead"
+WAIT_PREFIX = f"{KEY_PREFIX}:wait_ms"
+# Finished jobs per COMPLETED_BUCKET_S-second bucket, read by the backend's admission control
+COMPLETED_PREFIX = f"{KEY_PREFIX}:completed"
+COMPLETED_BUCKET_S = 10
+COMPLETED_TTL_S = 3600
+# Recent queue waits kept per class for /metrics percentiles
+WAIT_SAMPLES = 1000
+
+# A job's lease runs this many seconds past the last heartbeat of the worker holding it;
+# once it runs out the job is redelivered
+JOB_VISIBILITY_TIMEOUT_S = int(os.getenv("JOB_VISIBILITY_TIMEOUT_S", "300"))
+# A worker that has not heartbeated for this long is considered dead and its jobs are redelivered
+CONSUMER_TIMEOUT_S = int(os.getenv("CONSUMER_TIMEOUT_S", "30"))
+# Deliveries per job before it is moved to the dead-letter list and marked failed
+MAX_ATTEMPTS = max(1, int(os.getenv("MAX_ATTEMPTS", "3")))
+# Jobs one user may have taken by workers at once; 0 means no limit
+MAX_INFLIGHT_PER_USER = max(0, int(os.getenv("MAX_INFLIGHT_PER_USER", "0")))
+
+
+def parse_weights(value):
+    """"high:4,normal:2,low:1" -> [("high", 4), ("normal", 2), ("low", 1)], highest priority first."""
+    weights = []
+    for item in value.split(","):
+        name, _, weight = item.strip().partition(":")
+        weights.append((name, max(1, int(weight or 1))))
+    return weights
+
+
+# Classes are served in weighted round-robin, so low priority work still progresses
+PRIORITY_WEIGHTS = parse_weights(os.getenv("PRIORITY_WEIGHTS", "high:4,normal:2,low:1"))
+PRIORITY_CLASSES = [name for name, _ in PRIORITY_WEIGHTS]
+DEFAULT_PRIORITY = os.getenv("DEFAULT_PRIORITY", "normal")
+if DEFAULT_PRIORITY not in PRIORITY_CLASSES:
+    raise ValueError(f"DEFAULT_PRIORITY {DEFAULT_PRIORITY} is not one of PRIORITY_WEIGHTS ({', '.join(PRIORITY_CLASSES)})")
+
+# Decrement a user's in-flight count, never below zero
+RELEASE_LUA = """
+local function release(user)
+    if tonumber(redis.call('HINCRBY', KEYS[3], user, -1)) < 0 then
+        redis.call('HSET', KEYS[3], user, 0)
+    end
+end
+"""
+
+# Shared by both recovery scripts: bump the attempt counter and either put the
+# message back at the front of its user's sub-queue or dead-letter it.
+# Dead-lettered messages are returned to the caller.
+REQUEUE_LUA = RELEASE_LUA + """
+local function requeue(raw, dead)
+    local ok, job = pcall(cjson.decode, raw)
+    if not ok then
+        redis.call('LPUSH', KEYS[2], raw)
+        return
+    end
+    release(job['user_id'])
+    job['attempts'] = (tonumber(job['attempts']) or 0) + 1
+    local message = cjson.encode(job)
+    if job['attempts'] >= tonumber(ARGV[2]) then
+        redis.call('LPUSH', KEYS[2], message)
+        table.insert(dead, message)
+        return
+    end
+    local class = job['priority'] or ARGV[3]
+    local queue = ARGV[4] .. ':' .. class .. ':user:' .. job['user_id']
+    -- Workers pop from the right, and the user goes to the head of the ring
+    if redis.call('RPUSH', queue, message) == 1 then
+        redis.call('LPUSH', ARGV[4] .. ':' .. class .. ':ring', job['user_id'])
+    end
+    redis.call('HINCRBY', KEYS[4], class, 1)
+    redis.call('LPUSH', KEYS[5], 1)
+end
+"""
+
+# KEYS: leases, dead letter, in-flight, depth, signal.
+# ARGV: now, max attempts, default class, key prefix.
+RELEASE_EXPIRED_LUA = REQUEUE_LUA + """
+local dead = {}
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, member in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], member)
+    local sep = string.find(member, '\\n', 1, true)
+    local consumer = string.sub(member, 1, sep - 1)
+    local raw = string.sub(member, sep + 1)
+    -- Zero means the owner acked it (or it was already recovered) in the meantime
+    if redis.call('LREM', ARGV[4] .. ':processing:' .. consumer, 1, raw) > 0 then
+        requeue(raw, dead)
+    end
+end
+return dead
+"""
+
+# KEYS: processing list, dead letter, in-flight, depth, signal, leases.
+# ARGV: consumer, max attempts, default class, key prefix.
+RELEASE_CONSUMER_LUA = REQUEUE_LUA + """
+local dead = {}
+for _, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    redis.call('ZREM', KEYS[6], ARGV[1] .. '\\n' .. raw)
+    requeue(raw, dead)
+end
+redis.call('DEL', KEYS[1])
+return dead
+"""
+
+# KEYS: processing list, leases, depth, in-flight.
+# ARGV: consumer, lease deadline, per-user cap, key prefix, then classes in the order to try.
+# Returns {message, user}: the user whose in-flight count was taken, even if the message
+# itself turns out to be unreadable.
+CLAIM_LUA = """
+local cap = tonumber(ARGV[3])
+for i = 5, #ARGV do
+    local class = ARGV[i]
+    local ring = ARGV[4] .. ':' .. class .. ':ring'
+    for _ = 1, redis.call('LLEN', ring) do
+        -- Rotate the ring so the next claim starts with the following user
+        local user = redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        if cap <= 0 or (tonumber(redis.call('HGET', KEYS[4], user)) or 0) < cap then
+            local queue = ARGV[4] .. ':' .. class .. ':user:' .. user
+            local message = redis.call('RPOP', queue)
+            if redis.call('LLEN', queue) == 0 then
+                redis.call('LREM', ring, 1, user)
+            end
+            if message then
+                redis.call('LPUSH', KEYS[1], message)
+                redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1] .. '\\n' .. message)
+                redis.call('HINCRBY', KEYS[3], class, -1)
+                redis.call('HINCRBY', KEYS[4], user, 1)
+                return {message, user}
+            end
+        end
+    end
+end
+return false
+"""
+
+# KEYS: processing list, leases. ARGV: consumer, lease deadline.
+# Only leases that still exist are extended (XX), so a job acked or recovered in the
+# meantime is not leased again.
+RENEW_LUA = """
+for _, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    redis.call('ZADD', KEYS[2], 'XX', ARGV[2], ARGV[1] .. '\\n' .. raw)
+end
+"""
+
+# KEYS: processing list, leases, in-flight, completed bucket. ARGV: message, lease member, user id, bucket TTL.
+ACK_LUA = RELEASE_LUA + """
+redis.call('ZREM', KEYS[2], ARGV[2])
+-- Only the first ack of a delivery frees the user's in-flight slot and counts as a completion
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) > 0 then
+    release(ARGV[3])
+    redis.call('INCR', KEYS[4])
+    redis.call('EXPIRE', KEYS[4], ARGV[4])
+end
+"""
+
+
+# Same script as the backend's enqueue (backend/app/job_queue.py); workers use it to
+# queue the page sub-jobs of a document.
+# KEYS: user queue, class ring, depth hash, signal list. ARGV: message, user id, class.
+ENQUEUE_LUA = """
+if redis.call('LPUSH', KEYS[1], ARGV[1]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+redis.call('HINCRBY', KEYS[3], ARGV[3], 1)
+redis.call('LPUSH', KEYS[4], 1)
+redis.call('LTRIM', KEYS[4], 0, 999)
+"""
+
+
+class ReliableQueue:
+    def __init__(self, redis_client, consumer=None):
+        self.r = redis_client
+        # Unique per process, so a restarted worker never adopts a dead one's list
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self.processing_key = f"{PROCESSING_PREFIX}:{self.consumer}"
+        self.claim_script = self.r.register_script(CLAIM_LUA)
+        self.ack_script = self.r.register_script(ACK_LUA)
+        self.renew_script = self.r.register_script(RENEW_LUA)
+        self.release_expired_script = self.r.register_script(RELEASE_EXPIRED_LUA)
+        self.release_consumer_script = self.r.register_script(RELEASE_CONSUMER_LUA)
+        self.enqueue_script = self.r.register_script(ENQUEUE_LUA)
+        # Each weight unit is one turn at being tried first
+        self.schedule = [name for name, weight in PRIORITY_WEIGHTS for _ in range(weight)]
+        self.turns = itertools.count()
+
+    def lease_member(self, message):
+        return f"{self.consumer}\n".encode("utf-8") + message
+
+    def class_order(self):
+        first = self.schedule[next(self.turns) % len(self.schedule)]
+        return [first] + [name for name in PRIORITY_CLASSES if name != first]
+
+    def try_claim(self):
+        claimed = self.claim_script(
+            keys=[self.processing_key, LEASES_KEY, DEPTH_KEY, INFLIGHT_KEY],
+            args=[self.consumer, time.time() + JOB_VISIBILITY_TIMEOUT_S, MAX_INFLIGHT_PER_USER, KEY_PREFIX] + self.class_order(),
+        )
+        if not claimed:
+            return None
+        message, user_id = claimed
+        return message, user_id.decode("utf-8")
+
+    def claim(self, timeout=5):
+        """Take the next job in fair order, waiting up to timeout seconds.
+
+        Returns (raw message, user id) or None; the user id is the one to ack with.
+        """
+        deadline = time.time() + timeout
+        while True:
+            claimed = self.try_claim()
+            if claimed is not None:
+                return claimed
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            # Sleep until a job is queued; wake at least every second in case
+            # a user under MAX_INFLIGHT_PER_USER became eligible again
+            self.r.brpop(SIGNAL_KEY, timeout=min(1, remaining))
+
+    def ack(self, message, user_id):
+        bucket = int(time.time()) // COMPLETED_BUCKET_S
+        self.ack_script(
+            keys=[self.processing_key, LEASES_KEY, INFLIGHT_KEY, f"{COMPLETED_PREFIX}:{bucket}"],
+            args=[message, self.lease_member(message), user_id, COMPLETED_TTL_S],
+        )
+
+    def enqueue_many(self, jobs):
+        """Queue (user_id, priority, message) tuples with one pipelined round trip."""
+        pipe = self.r.pipeline(transaction=False)
+        for user_id, priority, message in jobs:
+            self.enqueue_script(
+                keys=[f"{KEY_PREFIX}:{priority}:user:{user_id}", f"{KEY_PREFIX}:{priority}:ring", DEPTH_KEY, SIGNAL_KEY],
+                args=[message, str(user_id), priority],
+                client=pipe,
+            )
+        pipe.execute()
+
+    def record_wait(self, priority, wait_ms):
+        pipe = self.r.pipeline()
+        pipe.lpush(f"{WAIT_PREFIX}:{priority}", round(wait_ms, 1))
+        pipe.ltrim(f"{WAIT_PREFIX}:{priority}", 0, WAIT_SAMPLES - 1)
+        pipe.execute()
+
+    def heartbeat(self):
+        """Mark this worker alive and renew the leases of the jobs it holds."""
+        now = time.time()
+        pipe = self.r.pipeline()
+        pipe.sadd(CONSUMERS_KEY, self.consumer)
+        pipe.set(f"{HEARTBEAT_PREFIX}:{self.consumer}", int(now), ex=CONSUMER_TIMEOUT_S)
+        self.renew_script(keys=[self.processing_key, LEASES_KEY], args=[self.consumer, now + JOB_VISIBILITY_TIMEOUT_S], client=pipe)
+        pipe.execute()
+
+    def recover(self):
+        """Redeliver messages from dead workers and expired leases; returns the dead-lettered ones."""
+        dead = []
+        for consumer in self.r.smembers(CONSUMERS_KEY):
+            consumer = consumer.decode("utf-8")
+            if consumer == self.consumer or self.r.exists(f"{HEARTBEAT_PREFIX}:{consumer}"):
+                continue
+            dead += self.release_consumer_script(
+                keys=[f"{PROCESSING_PREFIX}:{consumer}", DEAD_LETTER_KEY, INFLIGHT_KEY, DEPTH_KEY, SIGNAL_KEY, LEASES_KEY],
+                args=[consumer, MAX_ATTEMPTS, DEFAULT_PRIORITY, KEY_PREFIX],
+            )
+            self.r.srem(CONSUMERS_KEY, consumer)
+
+        dead += self.release_expired_script(
+            keys=[LEASES_KEY, DEAD_LETTER_KEY, INFLIGHT_KEY, DEPTH_KEY, SIGNAL_KEY],
+            args=[time.time(), MAX_ATTEMPTS, DEFAULT_PRIORITY, KEY_PREFIX],
+        )
+        return dead
@@ -17,7 +17,7 @@ class JsonFormatter(logging.Formatter):
         }
         
         # Add specific fields if available in the extra dict
-        for key in ["job_id", "user_id", "status", "latency_ms", "model_version"]:
+        for key in ["job_id", "user_id", "status", "latency_ms", "model_version", "batch_size", "priority", "queue_wait_ms"]:
             if hasattr(record, key):
                 log_record[key] = getattr(record, key)
 
@@ -0,0 +1,174 @@
+import importlib
+import json
+import os
+import shutil
+import cv2
+import numpy as np
+from logger import setup_logger
+
+logger = setup_logger("worker-onnx", "worker")
+
+# Same defaults as ultralytics' predict(), so detections match the .pt path
+CONF_THRESHOLD = float(os.getenv("CONF_THRESHOLD", "0.25"))
+IOU_THRESHOLD = float(os.getenv("IOU_THRESHOLD", "0.7"))
+MAX_DETECTIONS = 300
+IMAGE_SIZE = int(os.getenv("INFERENCE_IMAGE_SIZE", "640"))
+
+# Runtime name -> the module that provides it
+RUNTIMES = {"onnxruntime": "onnxruntime", "openvino": "openvino"}
+
+# Exported models are cached next to the mounted weights, so only the first start exports
+MODEL_DIR = "/models" if os.path.exists("/models") else "."
+
+
+def export_path(model_name, quantize):
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    suffix = "_int8" if quantize else ""
+    return os.path.join(MODEL_DIR, f"{stem}_{IMAGE_SIZE}{suffix}.onnx")
+
+
+def export_onnx(model_name, quantize=False):
+    """Export (and optionally INT8-quantize) the model once; returns (onnx path, class names)."""
+    path = export_path(model_name, quantize)
+    # Class names live in a sidecar so a cached export never needs torch to be loaded
+    names_path = export_path(model_name, False).replace(".onnx", ".names.json")
+
+    if os.path.exists(path) and os.path.exists(names_path):
+        logger.info(f"Using cached ONNX model {path}")
+        with open(names_path) as f:
+            return path, {int(k): v for k, v in json.load(f).items()}
+
+    fp32_path = export_path(model_name, False)
+    if not os.path.exists(fp32_path) or not os.path.exists(names_path):
+        from yolo import YoloModel
+        torch_model = YoloModel(model_name).model
+        logger.info(f"Exporting {model_name} to ONNX at {IMAGE_SIZE}px...")
+        exported = torch_model.export(format="onnx", imgsz=IMAGE_SIZE, dynamic=True)
+        shutil.move(exported, fp32_path)
+        with open(names_path, "w") as f:
+            json.dump(torch_model.names, f)
+
+    if quantize and not os.path.exists(path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info(f"Quantizing {fp32_path} to INT8...")
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+    with open(names_path) as f:
+        return path, {int(k): v for k, v in json.load(f).items()}
+
+
+def letterbox(image):
+    """Resize keeping aspect ratio and pad to IMAGE_SIZE square; returns (image, scale, (pad_x, pad_y))."""
+    h, w = image.shape[:2]
+    scale = min(IMAGE_SIZE / h, IMAGE_SIZE / w)
+    new_w, new_h = round(w * scale), round(h * scale)
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (IMAGE_SIZE - new_w) / 2, (IMAGE_SIZE - new_h) / 2
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, scale, (left, top)
+
+
+def preprocess(images):
+    """BGR arrays -> normalised NCHW float32 batch, plus the letterbox transform of each image."""
+    batch, transforms = [], []
+    for image in images:
+        boxed, scale, pad = letterbox(image)
+        batch.append(boxed)
+        transforms.append((scale, pad, image.shape[:2]))
+    blob = np.stack(batch)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(blob, dtype=np.float32) / 255.0, transforms
+
+
+def postprocess(output, transform, names):
+    """One image's (4 + classes, anchors) output -> [{"label", "confidence", "box"}] in original pixels."""
+    predictions = output.T
+    class_ids = predictions[:, 4:].argmax(axis=1)
+    scores = predictions[np.arange(len(predictions)), 4 + class_ids]
+    keep = scores > CONF_THRESHOLD
+    predictions, class_ids, scores = predictions[keep], class_ids[keep], scores[keep]
+    if not len(scores):
+        return []
+
+    # cx, cy, w, h -> x, y, w, h for OpenCV's per-class NMS
+    xywh = predictions[:, :4].copy()
+    xywh[:, 0] -= xywh[:, 2] / 2
+    xywh[:, 1] -= xywh[:, 3] / 2
+    indices = cv2.dnn.NMSBoxesBatched(
+        xywh.tolist(), scores.tolist(), class_ids.tolist(), CONF_THRESHOLD, IOU_THRESHOLD
+    )
+    indices = np.array(indices).flatten()
+    indices = indices[np.argsort(-scores[indices])][:MAX_DETECTIONS]
+
+    scale, (pad_x, pad_y), (h, w) = transform
+    detections = []
+    for i in indices:
+        x, y, bw, bh = xywh[i]
+        x1 = min(max((x - pad_x) / scale, 0), w)
+        y1 = min(max((y - pad_y) / scale, 0), h)
+        x2 = min(max((x + bw - pad_x) / scale, 0), w)
+        y2 = min(max((y + bh - pad_y) / scale, 0), h)
+        detections.append({
+            "label": names[int(class_ids[i])],
+            "confidence": float(scores[i]),
+            "box": [float(x1), float(y1), float(x2), float(y2)]
+        })
+    return detections
+
+
+class OnnxYoloModel:
+    """YOLO detector exported to ONNX and run with ONNX Runtime or OpenVINO on CPU.
+
+    The runtime session is created on first use, so a supervisor can prepare the
+    export before fork and each worker process builds its own thread pool afterwards.
+    """
+
+    def __init__(self, model_name="yolov8n.pt", runtime="onnxruntime", quantize=False):
+        if runtime not in RUNTIMES:
+            raise ValueError(f"Unknown ONNX runtime {runtime}")
+        # Fail here, before a supervisor forks, rather than at each child's first inference
+        importlib.import_module(RUNTIMES[runtime])
+        self.runtime = runtime
+        self.path, self.names = export_onnx(model_name, quantize)
+        self.threads = os.cpu_count() or 1
+        self.session = None
+
+    def fuse(self):
+        # Fusion already happened at export time
+        pass
+
+    def set_threads(self, threads):
+        self.threads = threads
+
+    def load_session(self):
+        if self.runtime == "openvino":
+            import openvino as ov
+            compiled = ov.Core().compile_model(
+                self.path, "CPU", {"INFERENCE_NUM_THREADS": self.threads, "PERFORMANCE_HINT": "LATENCY"}
+            )
+            request = compiled.create_infer_request()
+            return lambda blob: request.infer({0: blob})[compiled.output(0)]
+
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+        return lambda blob: session.run(None, {input_name: blob})[0]
+
+    def predict(self, image):
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images):
+        """Run one batched forward pass over BGR arrays; same output shape as YoloModel.predict_batch."""
+        if self.session is None:
+            logger.info(f"Loading {self.path} with {self.runtime} ({self.threads} threads)")
+            self.session = self.load_session()
+        blob, transforms = preprocess(images)
+        outputs = self.session(blob)
+        return [postprocess(output, transform, self.names) for output, transform in zip(outputs, transforms)]
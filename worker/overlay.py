@@ -0,0 +1,95 @@
+import os
+import cv2
+import numpy as np
+
+# Overlay encoding: png (lossless), webp (OVERLAY_QUALITY 1-100, or above 100 for
+# lossless) or jpeg (OVERLAY_QUALITY). zlib's run-length strategy suits the long flat
+# runs of drawings: smaller and faster than the default strategy, where
+# OVERLAY_PNG_COMPRESSION (0-9) trades CPU for size.
+OVERLAY_FORMAT = os.getenv("OVERLAY_FORMAT", "png")
+OVERLAY_PNG_STRATEGY = os.getenv("OVERLAY_PNG_STRATEGY", "rle")
+OVERLAY_PNG_COMPRESSION = int(os.getenv("OVERLAY_PNG_COMPRESSION", "3"))
+OVERLAY_QUALITY = int(os.getenv("OVERLAY_QUALITY", "90"))
+# Downscaled JPEG derivatives stored next to the overlay, as name:longest side in
+# pixels, so list and preview pages never fetch the full-resolution image
+OVERLAY_SIZES = {
+    name: int(side)
+    for name, side in (item.split(":") for item in os.getenv("OVERLAY_SIZES", "thumbnail:320,medium:1280").split(",") if item)
+}
+OVERLAY_DERIVATIVE_QUALITY = int(os.getenv("OVERLAY_DERIVATIVE_QUALITY", "80"))
+
+BOX_COLOR = (0, 255, 0) # BGR
+BOX_THICKNESS = 3
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+
+PNG_STRATEGIES = {
+    "default": cv2.IMWRITE_PNG_STRATEGY_DEFAULT,
+    "filtered": cv2.IMWRITE_PNG_STRATEGY_FILTERED,
+    "rle": cv2.IMWRITE_PNG_STRATEGY_RLE,
+}
+
+FORMATS = {
+    "png": (".png", "image/png", lambda: [
+        cv2.IMWRITE_PNG_COMPRESSION, OVERLAY_PNG_COMPRESSION,
+        cv2.IMWRITE_PNG_STRATEGY, PNG_STRATEGIES[OVERLAY_PNG_STRATEGY],
+    ]),
+    "webp": (".webp", "image/webp", lambda: [cv2.IMWRITE_WEBP_QUALITY, OVERLAY_QUALITY]),
+    "jpeg": (".jpg", "image/jpeg", lambda: [cv2.IMWRITE_JPEG_QUALITY, OVERLAY_QUALITY]),
+}
+
+
+def draw(image, detections):
+    """Draw every box in one polyline call, then the labels; draws in place on the BGR array."""
+    if not detections:
+        return image
+    boxes = np.array([d["box"] for d in detections], dtype=np.float64).round().astype(np.int32)
+    # Each box as a closed 4-point polygon: (x1,y1) (x2,y1) (x2,y2) (x1,y2)
+    polygons = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 1, 2)
+    cv2.polylines(image, list(polygons), True, BOX_COLOR, BOX_THICKNESS)
+
+    # Labels sit above the box, or just inside it when the box touches the top edge
+    text_y = np.where(boxes[:, 1] > 20, boxes[:, 1] - 5, boxes[:, 1] + 15)
+    for d, x, y in zip(detections, boxes[:, 0], text_y):
+        cv2.putText(image, f"{d['label']} {d['confidence']:.2f}", (int(x), int(y)), FONT, FONT_SCALE, BOX_COLOR, 1, cv2.LINE_8)
+    return image
+
+
+def encode(image, fmt):
+    extension, content_type, params = FORMATS[fmt]
+    ok, data = cv2.imencode(extension, image, params())
+    if not ok:
+        raise ValueError(f"Could not encode overlay as {fmt}")
+    return data.tobytes(), extension, content_type
+
+
+def derivatives(image, sizes=None):
+    """JPEG-encoded downscales of the image, {name: bytes}; never upscales.
+
+    Sizes are produced largest first, each resized from the previous one, so the
+    full-resolution array is only read once.
+    """
+    outputs = {}
+    for name, side in sorted((sizes or OVERLAY_SIZES).items(), key=lambda item: -item[1]):
+        h, w = image.shape[:2]
+        scale = side / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, OVERLAY_DERIVATIVE_QUALITY])
+        if not ok:
+            raise ValueError(f"Could not encode overlay {name}")
+        outputs[name] = data.tobytes()
+    return outputs
+
+
+def render(image, detections):
+    """Draw the detections and encode the overlay and its downscaled sizes.
+
+    Returns {artifact: (object name, bytes, content type)}. The input array is drawn on.
+    """
+    draw(image, detections)
+    data, extension, content_type = encode(image, OVERLAY_FORMAT)
+    artifacts = {"overlay": (f"overlay{extension}", data, content_type)}
+    for name, data in derivatives(image).items():
+        artifacts[name] = (f"overlay-{name}.jpg", data, "image/jpeg")
+    return artifacts
@@ -0,0 +1,60 @@
+import json
+import os
+import time
+
+# The backend's result cache (backend/app/result_cache.py), for uploads that went
+# straight to storage: the API never reads their bytes, so the worker hashes the input
+# it downloads anyway and looks it up here. Keys, entries and stats are shared with the
+# backend, so either side can answer from a job the other registered.
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_SHARED = os.getenv("RESULT_CACHE_SHARED", "false").lower() == "true"
+
+KEY_PREFIX = "result_cache"
+INDEX_KEY = f"{KEY_PREFIX}:index"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+
+
+def cache_key(user_id, content_hash, model_name, model_version):
+    scope = "shared" if RESULT_CACHE_SHARED else user_id
+    return f"{KEY_PREFIX}:{scope}:{content_hash}:{model_name}:{model_version}"
+
+
+def lookup(r, key):
+    entry = r.get(key)
+    if entry is None:
+        return None
+    return json.loads(entry)
+
+
+def store(r, key, entry):
+    """Register the job that will produce results for this key, unless one already is."""
+    if not r.set(key, json.dumps(entry), nx=True, ex=RESULT_CACHE_TTL_SECONDS):
+        return False
+
+    now = time.time()
+    pipe = r.pipeline()
+    pipe.zadd(INDEX_KEY, {key: now})
+    # Forget index entries whose keys have already expired
+    pipe.zremrangebyscore(INDEX_KEY, 0, now - RESULT_CACHE_TTL_SECONDS)
+    pipe.zcard(INDEX_KEY)
+    size = pipe.execute()[-1]
+
+    # Evict the oldest entries once over the size bound
+    overflow = size - RESULT_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        evicted = [member for member, _ in r.zpopmin(INDEX_KEY, overflow)]
+        if evicted:
+            r.delete(*evicted)
+    return True
+
+
+def evict(r, key):
+    pipe = r.pipeline()
+    pipe.delete(key)
+    pipe.zrem(INDEX_KEY, key)
+    pipe.execute()
+
+
+def record(r, hit):
+    r.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
@@ -0,0 +1,118 @@
+import threading
+import time
+from sqlalchemy import String, cast, column, func, update
+from sqlalchemy import values as values_clause
+from sqlalchemy.dialects.postgresql import UUID
+from logger import setup_logger
+
+logger = setup_logger("worker-status", "worker")
+
+RETRY_DELAY_S = 1
+
+
+class StatusWriter:
+    """Coalesces job status transitions and writes them in one UPDATE ... FROM (VALUES ...) per flush.
+
+    Only the latest pending transition of a job is written, and every write (batched or
+    immediate) holds write_lock, so a job's transitions reach the database in the order
+    they were submitted. Rows that have already succeeded are never changed. Events are
+    published and callbacks run only after the write has committed.
+    """
+
+    def __init__(self, engine, jobs, publish, flush_interval_ms=100, flush_size=64):
+        self.engine = engine
+        self.jobs = jobs
+        self.publish = publish
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_size = flush_size
+        # job_id -> (payload, values, callbacks), in submission order
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.run, name="status-writer", daemon=True).start()
+        return self
+
+    def submit(self, payload, on_written=None, **values):
+        """Queue a transition for the next flush; on_written(written) runs once it is committed."""
+        job_id = payload["job_id"]
+        with self.cond:
+            # Re-inserting moves the job after everything submitted before this
+            _, _, callbacks = self.pending.pop(job_id, (None, None, []))
+            if on_written is not None:
+                callbacks = callbacks + [on_written]
+            self.pending[job_id] = (payload, values, callbacks)
+            if len(self.pending) >= self.flush_size:
+                self.cond.notify()
+
+    def write_now(self, payload, **values):
+        """Write a transition immediately, superseding any pending one; returns False if the job had already succeeded."""
+        job_id = payload["job_id"]
+        with self.write_lock:
+            with self.cond:
+                _, _, callbacks = self.pending.pop(job_id, (None, None, []))
+            batch = {job_id: (payload, values, callbacks)}
+            try:
+                updated = self.write(batch)
+            except Exception:
+                self.restore(batch)
+                raise
+        self.complete(batch, updated)
+        return job_id in updated
+
+    def restore(self, batch):
+        """Put a failed batch back without overriding transitions submitted since."""
+        with self.cond:
+            for job_id, (payload, values, callbacks) in batch.items():
+                if job_id in self.pending:
+                    newer_payload, newer_values, newer_callbacks = self.pending[job_id]
+                    self.pending[job_id] = (newer_payload, newer_values, callbacks + newer_callbacks)
+                else:
+                    self.pending[job_id] = (payload, values, callbacks)
+
+    def run(self):
+        while True:
+            with self.cond:
+                if len(self.pending) < self.flush_size:
+                    self.cond.wait(timeout=self.flush_interval)
+            if not self.pending:
+                continue
+
+            with self.write_lock:
+                with self.cond:
+                    batch, self.pending = self.pending, {}
+                try:
+                    updated = self.write(batch)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} job statuses, retrying: {e}")
+                    self.restore(batch)
+                    time.sleep(RETRY_DELAY_S)
+                    continue
+            self.complete(batch, updated)
+
+    def write(self, batch):
+        rows = values_clause(
+            column("id", String), column("status", String), column("result", String), name="v"
+        ).data([(job_id, values["status"], values.get("result")) for job_id, (_, values, _) in batch.items()])
+
+        with self.engine.begin() as conn:
+            updated = conn.execute(
+                update(self.jobs)
+                .where(self.jobs.c.id == cast(rows.c.id, UUID(as_uuid=True)), self.jobs.c.status != "succeeded")
+                # A transition without a result (e.g. processing) keeps whatever is stored
+                .values(status=rows.c.status, result=func.coalesce(rows.c.result, self.jobs.c.result))
+                .returning(self.jobs.c.id)
+            ).scalars().all()
+        return {str(job_id) for job_id in updated}
+
+    def complete(self, batch, updated):
+        for job_id, (payload, values, callbacks) in batch.items():
+            written = job_id in updated
+            if written:
+                self.publish(payload, values["status"], values.get("result"))
+            for callback in callbacks:
+                try:
+                    callback(written)
+                except Exception as e:
+                    logger.error(f"Status callback failed: {e}", extra={"job_id": job_id})
@@ -0,0 +1,126 @@
+import gc
+import os
+import signal
+import time
+import worker
+from logger import setup_logger
+
+logger = setup_logger("worker-supervisor", "worker")
+
+# Number of worker processes forked from the supervisor. The default is one per core but
+# at most MAX_DEFAULT_PROCESSES, since each process holds its own database pool.
+MAX_DEFAULT_PROCESSES = 8
+WORKER_PROCESSES = max(1, int(os.getenv("WORKER_PROCESSES", str(min(os.cpu_count() or 1, MAX_DEFAULT_PROCESSES)))))
+# Inference threads per process (torch intra-op, or the ONNX Runtime/OpenVINO pool);
+# by default the cores are split evenly
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0")) or max(1, (os.cpu_count() or 1) // WORKER_PROCESSES)
+# Children that die sooner than this after starting are restarted with exponential backoff
+MIN_CHILD_UPTIME_S = 30
+MAX_RESTART_BACKOFF_S = 30
+
+children = {}
+shutting_down = False
+
+
+def configure_threads(model):
+    try:
+        model.set_threads(TORCH_THREADS_PER_WORKER)
+    except Exception as e:
+        logger.warning(f"Could not configure inference threads: {e}")
+
+
+def run_child(slot, model):
+    # Let the supervisor decide how the child shuts down
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    configure_threads(model)
+    worker.reset_connections()
+
+    logger.info(f"Worker process {slot} started (pid {os.getpid()}, {TORCH_THREADS_PER_WORKER} inference threads)")
+    try:
+        worker.run(model)
+    except Exception as e:
+        logger.error(f"Worker process {slot} crashed: {e}")
+        os._exit(1)
+    os._exit(0)
+
+
+def spawn(slot, model):
+    pid = os.fork()
+    if pid == 0:
+        run_child(slot, model)
+    children[pid] = {"slot": slot, "started_at": time.time()}
+    return pid
+
+
+def shutdown(signum, frame):
+    global shutting_down
+    shutting_down = True
+    logger.info(f"Received signal {signum}, stopping {len(children)} worker processes...")
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def main():
+    # A ready file left by a previous run must not be mistaken for this one
+    if os.path.exists(worker.WORKER_READY_FILE):
+        os.remove(worker.WORKER_READY_FILE)
+
+    # Load the weights once in the parent; forked children share the pages copy-on-write.
+    # No inference (including warm-up) may run here: the torch/OpenMP thread pools must
+    # be created after fork, so each child warms up its own.
+    model = worker.load_model()
+    model.fuse()
+    logger.info(f"Model loaded {time.time() - worker.STARTED_AT:.1f}s after launch")
+
+    # Move everything allocated so far out of the GC's reach so collections in the
+    # children don't write to (and un-share) the pages holding the model objects
+    gc.freeze()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logger.info(
+        f"Supervisor starting {WORKER_PROCESSES} worker processes, using up to "
+        f"{WORKER_PROCESSES * (worker.WORKER_DB_POOL_SIZE + worker.WORKER_DB_MAX_OVERFLOW)} database connections..."
+    )
+    for slot in range(WORKER_PROCESSES):
+        spawn(slot, model)
+
+    backoff = {}
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        child = children.pop(pid, None)
+        if child is None or shutting_down:
+            continue
+
+        slot = child["slot"]
+        uptime = time.time() - child["started_at"]
+        logger.error(f"Worker process {slot} (pid {pid}) exited with status {status} after {uptime:.0f}s, restarting")
+
+        # Back off if a child keeps crashing right after start
+        if uptime < MIN_CHILD_UPTIME_S:
+            backoff[slot] = min(backoff.get(slot, 0.5) * 2, MAX_RESTART_BACKOFF_S)
+            time.sleep(backoff[slot])
+        else:
+            # A healthy run resets the delay; the next crash loop starts again from 1s
+            backoff.pop(slot, None)
+
+        if not shutting_down:
+            spawn(slot, model)
+
+    logger.info("Supervisor stopped.")
+
+
+if __name__ == "__main__":
+    main()
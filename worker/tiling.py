@@ -0,0 +1,135 @@
+import os
+import cv2
+import numpy as np
+
+# Tiled inference for drawings much larger than the model input. "auto" tiles images
+# whose longer side exceeds TILING_THRESHOLD, "always" tiles everything, "off" never does.
+TILING = os.getenv("TILING", "auto")
+TILING_THRESHOLD = int(os.getenv("TILING_THRESHOLD", "1280"))
+# Tiles are TILE_SIZE square, overlap by TILE_OVERLAP pixels, and go through the model
+# TILE_BATCH_SIZE at a time. Symbols smaller than the overlap are always seen whole by some tile.
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "128"))
+TILE_BATCH_SIZE = max(1, int(os.getenv("TILE_BATCH_SIZE", "8")))
+# Also run the whole (downscaled) image so objects larger than a tile are still found
+TILE_INCLUDE_FULL = os.getenv("TILE_INCLUDE_FULL", "true").lower() == "true"
+# Duplicates from overlapping tiles and the full-image pass are removed by per-class NMS
+# at this IoU. A box cut off at a tile seam is also dropped when intersection / its area
+# exceeds TILE_MERGE_THRESHOLD inside a same-class box from another tile.
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+TILE_MERGE_THRESHOLD = float(os.getenv("TILE_MERGE_THRESHOLD", "0.6"))
+# A box edge within this many pixels of an inner tile edge counts as cut by the seam
+SEAM_MARGIN = 2
+
+
+def needs_tiling(image):
+    if TILING == "always":
+        return True
+    return TILING == "auto" and max(image.shape[:2]) > TILING_THRESHOLD
+
+
+def tile_origins(length, tile_size, overlap):
+    """Start offsets along one axis; the last tile is aligned to the far edge."""
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap)
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+
+def tiles(image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Yield (x, y, view) for overlapping tiles covering the image; views share its memory."""
+    h, w = image.shape[:2]
+    for y in tile_origins(h, tile_size, overlap):
+        for x in tile_origins(w, tile_size, overlap):
+            yield x, y, image[y:y + tile_size, x:x + tile_size]
+
+
+def cut_at_seam(boxes, tiles, width, height, margin=SEAM_MARGIN):
+    """True for each box that touches an edge of its tile lying inside the image."""
+    return (
+        ((tiles[:, 0] > 0) & (boxes[:, 0] <= tiles[:, 0] + margin))
+        | ((tiles[:, 1] > 0) & (boxes[:, 1] <= tiles[:, 1] + margin))
+        | ((tiles[:, 2] < width) & (boxes[:, 2] >= tiles[:, 2] - margin))
+        | ((tiles[:, 3] < height) & (boxes[:, 3] >= tiles[:, 3] - margin))
+    )
+
+
+def merge(detections, tiles, size, iou_threshold=TILE_NMS_IOU, seam_threshold=TILE_MERGE_THRESHOLD):
+    """Per-class NMS over tile and full-image detections, then drop fragments cut at tile seams.
+
+    tiles[i] is the (x1, y1, x2, y2) tile detection i came from, or None for the full-image
+    pass; size is the image's (width, height). Kept boxes are returned as detected.
+    """
+    if len(detections) < 2:
+        return detections
+
+    boxes = np.array([d["box"] for d in detections], dtype=np.float64)
+    scores = np.array([d["confidence"] for d in detections], dtype=np.float64)
+    labels = {label: i for i, label in enumerate({d["label"] for d in detections})}
+    class_ids = np.array([labels[d["label"]] for d in detections])
+
+    xywh = boxes.copy()
+    xywh[:, 2:] -= xywh[:, :2]
+    keep = np.array(cv2.dnn.NMSBoxesBatched(xywh.tolist(), scores.tolist(), class_ids.tolist(), 0.0, iou_threshold), dtype=int).flatten()
+
+    # Full-image boxes get a tile that covers the image, so they never count as cut
+    width, height = size
+    tile_boxes = np.array([tile if tile is not None else (0, 0, width, height) for tile in tiles], dtype=np.float64)
+    from_tile = np.array([tile is not None for tile in tiles])
+    cut = from_tile & cut_at_seam(boxes, tile_boxes, width, height)
+    areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-9)
+
+    # Complete boxes first, then seam fragments by confidence; a fragment mostly inside a
+    # same-class box already kept from another tile is the same symbol
+    keep = keep[np.lexsort((-scores[keep], cut[keep]))]
+    kept = []
+    for i in keep:
+        if cut[i] and kept:
+            others = np.array(kept)
+            w = np.clip(np.minimum(boxes[i, 2], boxes[others, 2]) - np.maximum(boxes[i, 0], boxes[others, 0]), 0, None)
+            h = np.clip(np.minimum(boxes[i, 3], boxes[others, 3]) - np.maximum(boxes[i, 1], boxes[others, 1]), 0, None)
+            same = (
+                (class_ids[others] == class_ids[i])
+                & from_tile[others]
+                & (tile_boxes[others] != tile_boxes[i]).any(axis=1)
+            )
+            if (same & (w * h / np.minimum(areas[i], areas[others]) > seam_threshold)).any():
+                continue
+        kept.append(i)
+    return [detections[i] for i in sorted(kept, key=lambda i: -scores[i])]
+
+
+def predict_tiled(model, image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=TILE_BATCH_SIZE, include_full=TILE_INCLUDE_FULL):
+    """Detect on overlapping tiles in batches, map boxes back to image coordinates and merge seams."""
+    detections = []
+    sources = []
+    pending = list(tiles(image, tile_size, overlap))
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        for (x, y, view), tile_detections in zip(chunk, model.predict_batch([view for _, _, view in chunk])):
+            bounds = (x, y, x + view.shape[1], y + view.shape[0])
+            for d in tile_detections:
+                x1, y1, x2, y2 = d["box"]
+                detections.append({**d, "box": [x1 + x, y1 + y, x2 + x, y2 + y]})
+                sources.append(bounds)
+    if include_full:
+        full = model.predict(image)
+        detections += full
+        sources += [None] * len(full)
+    h, w = image.shape[:2]
+    return merge(detections, sources, (w, h))
+
+
+def predict_batch(model, images):
+    """Per-image detections; small images share one batched pass, large ones are tiled."""
+    results = [None] * len(images)
+    full = [i for i, image in enumerate(images) if not needs_tiling(image)]
+    if full:
+        for i, detections in zip(full, model.predict_batch([images[i] for i in full])):
+            results[i] = detections
+    for i, image in enumerate(images):
+        if results[i] is None:
+            results[i] = predict_tiled(model, image)
+    return results
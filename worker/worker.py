@@ -1,14 +1,28 @@
 import time
+# Taken before the remaining imports so the startup logs include them
+STARTED_AT = time.time()
+import hashlib
 import json
 import os
 import redis
 from minio import Minio
-from sqlalchemy import create_engine, MetaData, Table, Column, String, update
+from minio.commonconfig import CopySource
+from sqlalchemy import create_engine, select, MetaData, Table, Column, String, Integer
 from sqlalchemy.dialects.postgresql import UUID
 import io
 import csv
-from PIL import Image, ImageDraw
-from yolo import YoloModel
+import cv2
+import numpy as np
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import detection_store
+import documents
+import overlay
+import result_cache
+import tiling
+from status_writer import StatusWriter
+from job_queue import ReliableQueue, DEAD_LETTER_KEY, CONSUMER_TIMEOUT_S, DEFAULT_PRIORITY
 from logger import setup_logger
 
 logger = setup_logger("worker-main", "worker")
@@ -23,7 +37,59 @@ MINIO_BUCKET = os.getenv("MINIO_BUCKET", "models")
 MODEL_NAME = os.getenv("MODEL_NAME", "yolov8n.pt")
 MODEL_VERSION = os.getenv("MODEL_VERSION", "v1")
 
-# Setup connections
+# Inference backend: "torch" runs the .pt model through ultralytics; "onnxruntime"
+# and "openvino" run an ONNX export cached under /models. INFERENCE_PRECISION=int8
+# applies dynamic INT8 quantization to the export.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32")
+
+# Micro-batching: drain up to BATCH_SIZE queued jobs, waiting at most
+# BATCH_WINDOW_MS after the first one arrives. BATCH_SIZE=1 keeps the
+# original one-job-at-a-time behaviour.
+BATCH_SIZE = max(1, int(os.getenv("BATCH_SIZE", "1")))
+BATCH_WINDOW_MS = max(0, int(os.getenv("BATCH_WINDOW_MS", "50")))
+
+# Pipeline stages: PREFETCH_THREADS download the next PREFETCH_DEPTH inputs
+# while inference runs, and UPLOAD_THREADS render/upload results and write the
+# final status. At most UPLOAD_QUEUE_SIZE finished jobs wait for an upload thread.
+PREFETCH_THREADS = max(1, int(os.getenv("PREFETCH_THREADS", "2")))
+PREFETCH_DEPTH = max(1, int(os.getenv("PREFETCH_DEPTH", str(2 * BATCH_SIZE))))
+UPLOAD_THREADS = max(1, int(os.getenv("UPLOAD_THREADS", "4")))
+UPLOAD_QUEUE_SIZE = max(1, int(os.getenv("UPLOAD_QUEUE_SIZE", "16")))
+
+# Warm-up: before taking jobs, each worker process runs WARMUP_RUNS dummy
+# inferences per input size (WxH) at batch size 1, BATCH_SIZE and (when tiling)
+# TILE_BATCH_SIZE, so the first real job doesn't pay for lazy graph and
+# allocator setup. Once warm, the process heartbeats in Redis and touches
+# WORKER_READY_FILE.
+WARMUP_RUNS = max(0, int(os.getenv("WARMUP_RUNS", "2")))
+WARMUP_IMAGE_SIZES = [
+    tuple(int(v) for v in size.split("x")) for size in os.getenv("WARMUP_IMAGE_SIZES", "640x640").split(",")
+]
+WORKER_READY_FILE = os.getenv("WORKER_READY_FILE", "/tmp/worker-ready")
+
+# Status transitions are coalesced and written in one statement every
+# STATUS_FLUSH_INTERVAL_MS, or as soon as STATUS_FLUSH_SIZE jobs are pending.
+# Failures and redelivery checks are written immediately.
+STATUS_FLUSH_INTERVAL_MS = max(1, int(os.getenv("STATUS_FLUSH_INTERVAL_MS", "100")))
+STATUS_FLUSH_SIZE = max(1, int(os.getenv("STATUS_FLUSH_SIZE", "64")))
+
+# Threads per worker process that use the database: the status writer, queue
+# maintenance, the document combiners, and the prefetch and upload threads
+DOCUMENT_THREADS = 2
+DB_THREADS = 2 + DOCUMENT_THREADS + PREFETCH_THREADS + UPLOAD_THREADS
+# Database pool per worker process. By default it holds one connection per such thread
+# and never overflows, so a process uses at most DB_THREADS connections and the
+# container at most WORKER_PROCESSES times that; keep the total under Postgres'
+# max_connections together with the API's pools.
+WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", str(DB_THREADS)))
+WORKER_DB_MAX_OVERFLOW = int(os.getenv("WORKER_DB_MAX_OVERFLOW", "0"))
+
+# Setup connections; the reliable queue, status writer and document pool are created per process in run()
+reliable_queue = None
+status_writer = None
+# Combines finished documents off the status writer's thread (see finish_job)
+document_pool = None
 try:
     r = redis.Redis.from_url(REDIS_URL)
     minio_client = Minio(
@@ -32,15 +98,21 @@ try:
         secret_key=MINIO_SECRET_KEY,
         secure=False
     )
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, pool_size=WORKER_DB_POOL_SIZE, max_overflow=WORKER_DB_MAX_OVERFLOW, pool_pre_ping=True)
     metadata = MetaData()
-    
+
     # Reflect or define jobs table
     jobs = Table(
         'jobs', metadata,
         Column('id', UUID(as_uuid=True), primary_key=True),
         Column('status', String),
-        Column('result', String)
+        Column('result', String),
+        # Written when a PDF document is split into page sub-jobs
+        Column('user_id', UUID(as_uuid=True)),
+        Column('parent_id', UUID(as_uuid=True)),
+        Column('page', Integer),
+        Column('model_name', String),
+        Column('model_version', String)
     )
 except Exception as e:
     logger.error(f"Initialization error: {e}")
@@ -51,149 +123,468 @@ except Exception as e:
 if MODEL_NAME == "yolov8":
     MODEL_NAME = "yolov8n.pt"
 
-logger.info(f"Initializing YoloModel with {MODEL_NAME}...")
-try:
-    model = YoloModel(MODEL_NAME)
-except Exception as e:
-    logger.error(f"Failed to load model {MODEL_NAME}: {e}")
-    raise e
 
-logger.info("Worker started. Listening for jobs...")
+def load_model():
+    logger.info(f"Initializing {INFERENCE_BACKEND} model with {MODEL_NAME} ({INFERENCE_PRECISION})...")
+    try:
+        if INFERENCE_BACKEND in ("onnxruntime", "openvino"):
+            from onnx_yolo import OnnxYoloModel
+            return OnnxYoloModel(MODEL_NAME, runtime=INFERENCE_BACKEND, quantize=INFERENCE_PRECISION == "int8")
+        if INFERENCE_BACKEND != "torch":
+            raise ValueError(f"Unknown INFERENCE_BACKEND {INFERENCE_BACKEND}")
+        # Imported here so the ONNX backends never pay for loading ultralytics/torch
+        from yolo import YoloModel
+        return YoloModel(MODEL_NAME)
+    except Exception as e:
+        logger.error(f"Failed to load model {MODEL_NAME}: {e}")
+        raise e
+
+
+def set_job_status(payload, **values):
+    """Write the transition now unless the job has already succeeded; returns False if it had."""
+    # A redelivered job must never overwrite a result that was already recorded
+    return status_writer.write_now(payload, **values)
+
+
+def queue_job_status(payload, on_written=None, **values):
+    """Batch the transition into the status writer's next flush."""
+    status_writer.submit(payload, on_written, **values)
 
-while True:
-    # Blocking pop from Redis
+
+def publish_status(payload, status, result=None):
+    """Push the transition to the backend's per-user event stream (job_events:{user_id})."""
+    # Pages are reported through their document, which finishes once they all have
+    if "parent_id" in payload:
+        return
+    event = {"job_id": payload["job_id"], "status": status}
+    if result is not None:
+        event["result"] = result
     try:
-        raw_data = r.brpop("job_queue", timeout=5)
+        r.publish(f"job_events:{payload['user_id']}", json.dumps(event))
     except Exception as e:
-        logger.error(f"Redis error: {e}")
-        time.sleep(5)
-        continue
-    
-    if raw_data:
-        queue_name, payload_bytes = raw_data
-        try:
-            payload = json.loads(payload_bytes.decode('utf-8'))
-            job_id = payload["job_id"]
-            bucket = payload["bucket"]
-            path = payload["path"]
-            user_id = payload["user_id"]
-            
-            logger.info(f"Processing job: {job_id}", extra={"job_id": job_id, "user_id": user_id, "status": "processing"})
-    
-            try:
-                # Update status to processing
-                with engine.connect() as conn:
-                    conn.execute(
-                        update(jobs).where(jobs.c.id == job_id).values(status="processing")
+        logger.warning(f"Failed to publish job event: {e}", extra={"job_id": payload["job_id"]})
+
+
+def decode_image(data):
+    """Decode encoded image bytes once into the BGR array the model and overlay renderer share."""
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode input image")
+    return image
+
+
+def write_results(payload, image, detections):
+    job_id = payload["job_id"]
+    bucket = payload["bucket"]
+    user_id = payload["user_id"]
+
+    # 1. Generate Overlay Image(s) & CSV
+    try:
+        csv_buffer = io.StringIO()
+        csv_writer = csv.writer(csv_buffer)
+        csv_writer.writerow(["Label", "Confidence", "X1", "Y1", "X2", "Y2"])
+        for item in detections:
+            box = item["box"] # [x1, y1, x2, y2]
+            csv_writer.writerow([item["label"], f"{item['confidence']:.2f}", int(box[0]), int(box[1]), int(box[2]), int(box[3])])
+
+        # The decoded input is BGR, which is what OpenCV draws on and encodes; the
+        # array is not needed after this, so the overlay is drawn on it in place
+        outputs = overlay.render(image, detections)
+        outputs["csv"] = ("results.csv", csv_buffer.getvalue().encode('utf-8'), "text/csv")
+
+        for name, data, content_type in outputs.values():
+            minio_client.put_object(
+                bucket,
+                f"{user_id}/{job_id}/{name}",
+                io.BytesIO(data),
+                length=len(data),
+                content_type=content_type
+            )
+
+    except Exception as e:
+        logger.error(f"Error generating results: {e}", extra={"job_id": job_id})
+        raise e
+
+    return {
+        "detected": list({item["label"] for item in detections}),
+        "count": len(detections),
+        # Object names for the API, since the overlay format is configurable
+        "artifacts": {artifact: name for artifact, (name, _, _) in outputs.items()},
+    }
+
+
+def fail_job(payload, error):
+    job_id = payload["job_id"]
+    logger.error(f"Error processing job {job_id}: {error}", extra={"job_id": job_id, "status": "failed"})
+    try:
+        set_job_status(payload, status="failed")
+    except Exception as e:
+        logger.error(f"Failed to mark job {job_id} as failed: {e}", extra={"job_id": job_id})
+    ack(payload)
+    page_finished(payload)
+
+
+def ack(payload):
+    """Remove the job's message from the queue once it has reached a final status."""
+    try:
+        reliable_queue.ack(payload["message"], payload["user_id"])
+    except Exception as e:
+        logger.error(f"Failed to ack job {payload['job_id']}: {e}", extra={"job_id": payload["job_id"]})
+
+
+def split_document(payload):
+    """Queue one sub-job per page of a PDF; the document stays processing until its last page finishes."""
+    data = documents.fetch(minio_client, payload["bucket"], payload["path"])
+    pages = documents.page_count(data)
+    if not 0 < pages <= documents.PDF_MAX_PAGES:
+        raise ValueError(f"Document has {pages} pages (at most {documents.PDF_MAX_PAGES} allowed)")
+    # The backend charged the rate limit and admission for this many pages
+    if pages != payload.get("pages", pages):
+        raise ValueError(f"Document has {pages} pages but was admitted with {payload['pages']}")
+
+    page_payloads = documents.split(engine, jobs, r, payload, pages)
+    reliable_queue.enqueue_many([(page["user_id"], page["priority"], json.dumps(page)) for page in page_payloads])
+    logger.info(f"Document {payload['job_id']} split into {pages} pages", extra={"job_id": payload["job_id"], "user_id": payload["user_id"]})
+    ack(payload)
+
+
+def page_finished(payload):
+    """Count a finished page (succeeded or failed); the document's last page combines the results."""
+    if "parent_id" not in payload:
+        return
+    document_id = payload["parent_id"]
+    try:
+        if not documents.page_done(r, payload):
+            return
+        result = documents.combine(engine, minio_client, payload)
+        # Partial results are kept: failed_pages lists the pages that could not be processed
+        status = "succeeded" if len(result["failed_pages"]) < result["pages"] else "failed"
+        values = {"status": status, "result": json.dumps(result)}
+        logger.info(
+            f"Document {document_id} {status} ({result['pages']} pages, {len(result['failed_pages'])} failed).",
+            extra={"job_id": document_id, "status": status}
+        )
+    except Exception as e:
+        logger.error(f"Failed to combine document {document_id}: {e}", extra={"job_id": document_id, "status": "failed"})
+        values = {"status": "failed"}
+
+    try:
+        set_job_status({"job_id": document_id, "user_id": payload["user_id"]}, **values)
+    except Exception as e:
+        logger.error(f"Failed to mark document {document_id} as {values['status']}: {e}", extra={"job_id": document_id})
+
+
+# Object names of a job's outputs for results that predate the recorded "artifacts"
+ARTIFACTS = {"overlay": "overlay.png", "csv": "results.csv"}
+
+
+def use_result_cache(payload, data):
+    """Answer a direct upload from an earlier job with identical input; returns True if it was.
+
+    The backend checks the cache for uploads it streams itself; uploads that went straight
+    to storage are checked here, once their bytes have been downloaded anyway. Otherwise
+    this job is registered as the one producing results for the input.
+    """
+    job_id = payload["job_id"]
+    user_id = payload["user_id"]
+    key = result_cache.cache_key(user_id, hashlib.sha256(data).hexdigest(), payload["model_name"], payload["model_version"])
+    try:
+        entry = result_cache.lookup(r, key)
+        source = None
+        # A redelivered job finds its own entry and is simply processed again
+        if entry and entry["job_id"] != job_id:
+            with engine.connect() as conn:
+                source = conn.execute(select(jobs.c.status, jobs.c.result).where(jobs.c.id == entry["job_id"])).first()
+            if source is not None and source.status == "succeeded":
+                recorded = json.loads(source.result or "{}").get("artifacts") or {}
+                for name in {**ARTIFACTS, **recorded}.values():
+                    minio_client.copy_object(
+                        payload["bucket"],
+                        f"{user_id}/{job_id}/{name}",
+                        CopySource(payload["bucket"], f"{entry['user_id']}/{entry['job_id']}/{name}")
                     )
-                    conn.commit()
-    
-                # Download image from Minio
-                local_path = f"/tmp/{job_id}.png"
-                minio_client.fget_object(bucket, path, local_path)
-                
-                # --- Perform "Analysis" ---
-                detect_start = time.time()
-                detections = model.predict(local_path)
-                latency_ms = (time.time() - detect_start) * 1000
-                
+                detection_store.copy(engine, entry["job_id"], job_id, user_id)
+                set_job_status(payload, status="succeeded", result=source.result)
+                ack(payload)
+                result_cache.record(r, hit=True)
                 logger.info(
-                    f"Inference complete. Found {len(detections)} objects.", 
-                    extra={
-                        "job_id": job_id, 
-                        "user_id": user_id, 
-                        "latency_ms": latency_ms, 
-                        "object_count": len(detections),
-                        "model_version": MODEL_VERSION
-                    }
+                    f"Job {job_id} served from result cache (source job {entry['job_id']})",
+                    extra={"job_id": job_id, "user_id": user_id, "status": "succeeded", "model_version": payload["model_version"]}
                 )
-    
-                # 1. Generate Overlay Image & CSV
-                detected_classes = set()
-                
-                try:
-                    with Image.open(local_path) as img:
-                        # Handle transparency/mode
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                            
-                        draw = ImageDraw.Draw(img)
-                        
-                        csv_buffer = io.StringIO()
-                        csv_writer = csv.writer(csv_buffer)
-                        csv_writer.writerow(["Label", "Confidence", "X1", "Y1", "X2", "Y2"])
-    
-                        for item in detections:
-                            label = item["label"]
-                            conf = item["confidence"]
-                            box = item["box"] # [x1, y1, x2, y2]
-                            
-                            detected_classes.add(label)
-                            
-                            # Draw box
-                            draw.rectangle(box, outline="#00ff00", width=3)
-                            # Draw text background for readability
-                            text_content = f"{label} {conf:.2f}"
-                            # Simple estimation of text size or just draw plainly
-                            draw.text((box[0], box[1] - 10 if box[1] > 20 else box[1] + 5), text_content, fill="#00ff00")
-                            
-                            # Add to CSV
-                            csv_writer.writerow([label, f"{conf:.2f}", int(box[0]), int(box[1]), int(box[2]), int(box[3])])
-                        
-                        # Save overlay to buffer
-                        overlay_buffer = io.BytesIO()
-                        img.save(overlay_buffer, format="PNG")
-                        overlay_buffer.seek(0)
-                        
-                        # Upload overlay
-                        overlay_path = f"{user_id}/{job_id}/overlay.png"
-                        minio_client.put_object(
-                            bucket,
-                            overlay_path,
-                            overlay_buffer,
-                            length=overlay_buffer.getbuffer().nbytes,
-                            content_type="image/png"
-                        )
-                        
-                        # Upload CSV
-                        csv_content = csv_buffer.getvalue().encode('utf-8')
-                        csv_path = f"{user_id}/{job_id}/results.csv"
-                        minio_client.put_object(
-                            bucket,
-                            csv_path,
-                            io.BytesIO(csv_content),
-                            length=len(csv_content),
-                            content_type="text/csv"
-                        )
-    
-                except Exception as e:
-                    logger.error(f"Error generating results: {e}", extra={"job_id": job_id})
-                    raise e
-    
-                # --- Update status to SUCCEEDED ---
-                result_json = {"detected": list(detected_classes), "count": len(detections)}
-    
-                with engine.connect() as conn:
-                    conn.execute(
-                        update(jobs).where(jobs.c.id == job_id).values(
-                            status="succeeded",
-                            result=json.dumps(result_json)
-                        )
-                    )
-                    conn.commit()
-                
-                # Cleanup
-                if os.path.exists(local_path):
-                    os.remove(local_path)
-                    
-                logger.info(f"Job {job_id} succeeded.", extra={"job_id": job_id, "status": "succeeded"})
-    
-            except Exception as e:
-                logger.error(f"Error processing job {job_id}: {e}", extra={"job_id": job_id, "status": "failed"})
-                with engine.connect() as conn:
-                    conn.execute(
-                        update(jobs).where(jobs.c.id == job_id).values(status="failed")
-                    )
-                    conn.commit()
+                return True
+
+        result_cache.record(r, hit=False)
+        if entry and entry["job_id"] != job_id and (source is None or source.status == "failed"):
+            result_cache.evict(r, key)
+        result_cache.store(r, key, {"job_id": job_id, "user_id": user_id})
+    except Exception as e:
+        # The cache is an optimisation only; fall back to normal processing
+        logger.warning(f"Result cache unavailable: {e}", extra={"job_id": job_id, "user_id": user_id})
+    return False
+
+
+def parse_payload(payload_bytes):
+    try:
+        payload = json.loads(payload_bytes.decode('utf-8'))
+        for key in ("job_id", "user_id", "bucket", "path"):
+            if key not in payload:
+                raise KeyError(key)
+        # Acks match on the exact bytes that were queued
+        payload["message"] = payload_bytes
+        return payload
+    except Exception as e:
+        logger.error(f"Error parsing job payload: {e}")
+        return None
+
+
+def record_queue_wait(payload):
+    # Only first deliveries count; a redelivery's wait includes the lost attempt
+    if payload.get("attempts", 0) or "enqueued_at" not in payload:
+        return
+    priority = payload.get("priority", DEFAULT_PRIORITY)
+    wait_ms = (time.time() - payload["enqueued_at"]) * 1000
+    logger.info(
+        f"Job {payload['job_id']} waited {wait_ms:.0f} ms in the {priority} queue",
+        extra={"job_id": payload["job_id"], "user_id": payload["user_id"], "priority": priority, "queue_wait_ms": wait_ms}
+    )
+    try:
+        reliable_queue.record_wait(priority, wait_ms)
+    except Exception as e:
+        logger.warning(f"Failed to record queue wait: {e}", extra={"job_id": payload["job_id"]})
+
+
+def download_input(payload):
+    job_id = payload["job_id"]
+    attempt = payload.get("attempts", 0) + 1
+    logger.info(f"Processing job: {job_id} (attempt {attempt})", extra={"job_id": job_id, "user_id": payload["user_id"], "status": "processing"})
+    try:
+        if attempt == 1:
+            queue_job_status(payload, status="processing")
+        elif not set_job_status(payload, status="processing"):
+            # Redelivered after its first run had already finished; nothing left to do
+            logger.info(f"Job {job_id} already succeeded, skipping redelivery.", extra={"job_id": job_id})
+            ack(payload)
+            # The first run may have stopped before counting its page
+            page_finished(payload)
+            return None
+
+        if payload.get("type") == "document":
+            split_document(payload)
+            return None
+        if "page" in payload:
+            # Only this page is rasterized; the PDF itself is cached across a document's pages
+            data = documents.fetch(minio_client, payload["bucket"], payload["path"])
+            return payload, documents.render_page(data, payload["page"], payload.get("dpi", documents.PDF_DPI))
+
+        # Stream the image from Minio into memory and decode it once
+        response = minio_client.get_object(payload["bucket"], payload["path"])
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+        if payload.get("result_cache") and use_result_cache(payload, data):
+            return None
+        return payload, decode_image(data)
+    except Exception as e:
+        fail_job(payload, e)
+        return None
+
+
+def prefetch_loop(download_queue):
+    """Stage 1: take jobs from Redis and download their inputs ahead of inference."""
+    while True:
+        # Next job in fair order, moved into this process's processing list
+        try:
+            claimed = reliable_queue.claim(timeout=5)
+        except Exception as e:
+            logger.error(f"Redis error: {e}")
+            time.sleep(5)
+            continue
+
+        if not claimed:
+            continue
+
+        payload_bytes, user_id = claimed
+        payload = parse_payload(payload_bytes)
+        if payload is None:
+            # Park malformed messages rather than redelivering them forever; the ack
+            # frees the in-flight slot the claim took from the queue's user
+            r.lpush(DEAD_LETTER_KEY, payload_bytes)
+            reliable_queue.ack(payload_bytes, user_id)
+            continue
+
+        record_queue_wait(payload)
+
+        item = download_input(payload)
+        if item is not None:
+            # Blocks once PREFETCH_DEPTH inputs are already waiting for inference
+            download_queue.put(item)
+
+
+def next_batch(download_queue):
+    """Wait for the first downloaded input, then take up to BATCH_SIZE within the batch window."""
+    try:
+        batch = [download_queue.get(timeout=5)]
+    except queue.Empty:
+        return []
+
+    deadline = time.time() + BATCH_WINDOW_MS / 1000
+    while len(batch) < BATCH_SIZE:
+        remaining = deadline - time.time()
+        try:
+            if remaining > 0:
+                batch.append(download_queue.get(timeout=remaining))
+            else:
+                batch.append(download_queue.get_nowait())
+        except queue.Empty:
+            break
+
+    return batch
+
+
+def finish_job(payload, image, detections):
+    """Stage 3: render and upload the overlay/CSV, store the detections, then record the final status."""
+    job_id = payload["job_id"]
+    try:
+        result_json = write_results(payload, image, detections)
+        # Stored before the status flips, so a succeeded job always has its rows
+        detection_store.store(engine, job_id, payload["user_id"], detections)
+
+        # --- Update status to SUCCEEDED ---
+        # The message is acked only once the status is committed, so a crash before
+        # the flush leads to redelivery rather than a job stuck in processing
+        def written(updated):
+            ack(payload)
+            logger.info(f"Job {job_id} succeeded.", extra={"job_id": job_id, "status": "succeeded"})
+            # This runs on the status writer's thread; combining a document there would
+            # hold up every other job's status flush
+            if "parent_id" in payload:
+                document_pool.submit(page_finished, payload)
+
+        queue_job_status(payload, written, status="succeeded", result=json.dumps(result_json))
+
+    except Exception as e:
+        fail_job(payload, e)
+
+
+def infer_batch(model, ready, upload_pool, upload_slots):
+    """Stage 2: one batched forward pass, then hand each job to the upload pool."""
+    batch_size = len(ready)
+
+    # --- Perform "Analysis" as a single batched forward pass ---
+    detect_start = time.time()
+    try:
+        # Large drawings are tiled; everything else shares one batched pass
+        batch_detections = tiling.predict_batch(model, [image for _, image in ready])
+    except Exception as e:
+        for payload, image in ready:
+            fail_job(payload, e)
+        return
+    latency_ms = (time.time() - detect_start) * 1000
+
+    for (payload, image), detections in zip(ready, batch_detections):
+        logger.info(
+            f"Inference complete. Found {len(detections)} objects.",
+            extra={
+                "job_id": payload["job_id"],
+                "user_id": payload["user_id"],
+                "latency_ms": latency_ms,
+                "batch_size": batch_size,
+                "object_count": len(detections),
+                "model_version": MODEL_VERSION
+            }
+        )
+
+        # Blocks once UPLOAD_QUEUE_SIZE jobs are already waiting for an upload thread
+        upload_slots.acquire()
+        future = upload_pool.submit(finish_job, payload, image, detections)
+        future.add_done_callback(lambda f: upload_slots.release())
+
+
+def maintain_queue():
+    """Heartbeat for this process and redeliver jobs held by dead workers or expired leases."""
+    while True:
+        try:
+            reliable_queue.heartbeat()
+            for message in reliable_queue.recover():
+                payload = parse_payload(message)
+                if payload is None:
+                    continue
+                logger.error(
+                    f"Job {payload['job_id']} was not completed after {payload['attempts']} deliveries, moved to dead-letter queue.",
+                    extra={"job_id": payload["job_id"], "status": "failed"}
+                )
+                set_job_status(payload, status="failed")
+                page_finished(payload)
         except Exception as e:
-             logger.error(f"Error parsing job payload: {e}")
+            logger.error(f"Queue maintenance error: {e}")
+        time.sleep(CONSUMER_TIMEOUT_S / 3)
+
+
+def warm_up(model):
+    start = time.time()
+    batch_sizes = {1, BATCH_SIZE}
+    if tiling.TILING != "off":
+        # Tiles go through the model TILE_BATCH_SIZE at a time
+        batch_sizes.add(tiling.TILE_BATCH_SIZE)
+    batch_sizes = sorted(batch_sizes)
+    for width, height in WARMUP_IMAGE_SIZES:
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        for batch_size in batch_sizes:
+            for _ in range(WARMUP_RUNS):
+                model.predict_batch([image] * batch_size)
+    logger.info(f"Warm-up finished in {(time.time() - start) * 1000:.0f} ms (sizes {WARMUP_IMAGE_SIZES}, batch sizes {batch_sizes})")
+
+
+def mark_ready():
+    try:
+        with open(WORKER_READY_FILE, "w") as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        logger.warning(f"Could not write ready file {WORKER_READY_FILE}: {e}")
+
+
+def run(model):
+    global reliable_queue, status_writer, document_pool
+    if WARMUP_RUNS:
+        warm_up(model)
+
+    reliable_queue = ReliableQueue(r)
+    status_writer = StatusWriter(engine, jobs, publish_status, STATUS_FLUSH_INTERVAL_MS, STATUS_FLUSH_SIZE).start()
+    document_pool = ThreadPoolExecutor(max_workers=DOCUMENT_THREADS, thread_name_prefix="documents")
+    reliable_queue.heartbeat()
+    threading.Thread(target=maintain_queue, name="queue-maintenance", daemon=True).start()
+
+    download_queue = queue.Queue(maxsize=PREFETCH_DEPTH)
+    for i in range(PREFETCH_THREADS):
+        threading.Thread(target=prefetch_loop, args=(download_queue,), name=f"prefetch-{i}", daemon=True).start()
+
+    upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_THREADS, thread_name_prefix="upload")
+    upload_slots = threading.BoundedSemaphore(UPLOAD_QUEUE_SIZE)
+
+    mark_ready()
+    logger.info(
+        f"Worker started {time.time() - STARTED_AT:.1f}s after launch. Listening for jobs (batch size {BATCH_SIZE}, "
+        f"window {BATCH_WINDOW_MS} ms, prefetch {PREFETCH_DEPTH}, upload threads {UPLOAD_THREADS})..."
+    )
+
+    while True:
+        ready = next_batch(download_queue)
+        if ready:
+            infer_batch(model, ready, upload_pool, upload_slots)
+
+
+def reset_connections():
+    """Drop pooled connections inherited from a parent process after fork()."""
+    engine.dispose(close=False)
+    r.connection_pool.reset()
+
+
+def main():
+    run(load_model())
+
+
+if __name__ == "__main__":
+    main()
@@ -16,12 +16,29 @@ class YoloModel:
         else:
             self.model = YOLO(model_path)
 
-    def predict(self, image_path):
-        print(f"Running inference on {image_path}")
-        results = self.model(image_path)
+    def fuse(self):
+        """Fuse Conv+BN layers up front so forked worker processes share the final weights."""
+        self.model.fuse()
+
+    def set_threads(self, threads):
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+    def predict(self, image):
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images):
+        """Run one batched forward pass and return a detections list per input, in order.
+
+        Inputs may be file paths or BGR NumPy arrays (as decoded by OpenCV).
+        """
+        print(f"Running inference on {len(images)} image(s)")
+        results = self.model(list(images), batch=len(images))
         
-        detections = []
+        batch_detections = []
         for result in results:
+            detections = []
             boxes = result.boxes
             for box in boxes:
                 x1, y1, x2, y2 = box.xyxy[0].tolist()
@@ -34,5 +51,6 @@ class YoloModel:
                     "confidence": conf,
                     "box": [x1, y1, x2, y2]
                 })
+            batch_detections.append(detections)
         
-        return detections
+        return batch_detections